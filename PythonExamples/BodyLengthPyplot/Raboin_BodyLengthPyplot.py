@@ -63,6 +63,16 @@ for i in [1, 2, 3, 4, 5]:
 # In[7]:
 
 
+from sms_histograms import accumulate_histograms
+
+for histogram in accumulate_histograms([data]):
+    histogram.plot(pyplot.gca())
+    pyplot.show()
+
+
+# In[8]:
+
+
 print('Eric Raboin Ex9.2')
 
 
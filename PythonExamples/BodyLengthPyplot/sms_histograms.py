@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Histograms for the Raboin_BodyLengthPyplot plots that are built up chunk by
+# chunk against fixed bin edges, so all seven plots come out of one pass over
+# the corpus and are drawn from the counts instead of the full columns.
+
+import argparse
+
+import numpy as np
+
+from sms_features import iter_features
+
+
+# Counts of one column (optionally raised to 1/exponent) against fixed bin
+# edges. Counts from different chunks or workers add up with merge.
+class Histogram:
+
+    def __init__(self, title, column, edges, exponent=1):
+        self.title = title
+        self.column = column
+        self.edges = np.asarray(edges, dtype=float)
+        self.exponent = exponent
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if self.exponent != 1:
+            values = values ** (1 / self.exponent)
+        counts, _ = np.histogram(values, self.edges)
+        self.counts += counts
+
+    def add_chunk(self, chunk):
+        self.add(chunk[self.column].values)
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('cannot merge histograms with different bin edges')
+        self.counts += other.counts
+        return self
+
+    # Draws the counts on a matplotlib Axes the same way pyplot.hist would
+    def plot(self, ax):
+        ax.hist(self.edges[:-1], bins=self.edges, weights=self.counts)
+        ax.set_title(self.title)
+
+    def __repr__(self):
+        return ("Histogram(title='{self.title}', column='{self.column}', "
+                "exponent={self.exponent}, total={total})".format(
+                    self=self, total=int(self.counts.sum())))
+
+
+# The seven histograms from the notebook. The notebook lets pyplot pick 40
+# bins from the data for the transforms; here the edges are fixed up front
+# over the full range of punct% (0 to 100) raised to 1/i.
+def report_histograms():
+    histograms = [
+        Histogram('Body Length Distribution', 'body_len', np.linspace(0, 200, 40)),
+        Histogram('Punctuation % Distribution', 'punct%', np.linspace(0, 50, 40)),
+    ]
+    for i in [1, 2, 3, 4, 5]:
+        histograms.append(Histogram('Transformation: 1/{}'.format(str(i)), 'punct%',
+                                    np.linspace(0, 100 ** (1 / i), 41), exponent=i))
+    return histograms
+
+
+# Feeds every chunk to every histogram and returns the histograms
+def accumulate_histograms(chunks, histograms=None):
+    if histograms is None:
+        histograms = report_histograms()
+    for chunk in chunks:
+        for histogram in histograms:
+            histogram.add_chunk(chunk)
+    return histograms
+
+
+# Builds the report histograms for a corpus file in one streaming pass
+def corpus_histograms(path, chunksize=100000):
+    return accumulate_histograms(iter_features(path, chunksize))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print the report histogram counts for a corpus.')
+    parser.add_argument('path', nargs='?', default='SMSSpamCollection.tsv')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+    for histogram in corpus_histograms(args.path, args.chunksize):
+        print(histogram)
+        print(histogram.counts)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Headless version of the Raboin_BodyLengthPyplot report for nightly jobs on
+# servers without a display. The histograms are built in one streaming pass
+# and then drawn with the Agg backend to PNG/SVG files by a pool of worker
+# processes, each of which reuses a single figure for every plot it draws.
+#
+#     python sms_report.py SMSSpamCollection.tsv --output-dir report --formats png svg
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot
+
+from sms_histograms import corpus_histograms
+
+# The figure each worker draws on, created once by _start_worker
+_figure = None
+
+
+def _start_worker(figsize, dpi):
+    global _figure
+    _figure = pyplot.figure(figsize=figsize, dpi=dpi)
+
+
+# Clears the worker's figure, draws one histogram on it and saves it in every
+# requested format. Returns the paths written.
+def _render(histogram, output_dir, formats):
+    _figure.clear()
+    histogram.plot(_figure.add_subplot())
+    name = re.sub(r'[^a-z0-9]+', '_', histogram.title.lower()).strip('_')
+    paths = []
+    for file_format in formats:
+        path = os.path.join(output_dir, '{}.{}'.format(name, file_format))
+        _figure.savefig(path, format=file_format)
+        paths.append(path)
+    return paths
+
+
+# Renders every histogram to output_dir with a pool of worker processes
+def render_report(histograms, output_dir, formats=('png',), workers=None,
+                  figsize=(6.4, 4.8), dpi=100):
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(figsize, dpi)) as pool:
+        jobs = [pool.submit(_render, histogram, output_dir, formats) for histogram in histograms]
+        return [path for job in jobs for path in job.result()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the SMS report histograms to files.')
+    parser.add_argument('path', nargs='?', default='SMSSpamCollection.tsv')
+    parser.add_argument('--output-dir', default='report')
+    parser.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg'])
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    histograms = corpus_histograms(args.path, args.chunksize)
+    paths = render_report(histograms, args.output_dir, args.formats, args.workers, dpi=args.dpi)
+    for path in paths:
+        print(path)
+    print('Rendered {} files in {:.2f}s'.format(len(paths), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
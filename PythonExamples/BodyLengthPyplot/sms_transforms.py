@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Evaluates many power transforms of a feature at once instead of plotting
+# (data['punct%'])**(1/i) one exponent at a time. Every transform is computed
+# into one 2-D array (a row per transform) and the skewness, kurtosis and
+# binned counts of all rows come out of the same vectorized pass, so the most
+# normal looking transform can be picked without drawing anything.
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from sms_features import add_features, read_corpus
+
+# Box-Cox lambdas tried when fitting the Box-Cox transform
+_boxcox_lambdas = np.linspace(-2, 2, 81)
+
+
+# Box-Cox of x (all positive) for one lambda
+def _boxcox(x, lmbda):
+    if lmbda == 0:
+        return np.log(x)
+    return (x ** lmbda - 1) / lmbda
+
+
+# Picks the Box-Cox lambda with the highest log-likelihood from the grid
+def _boxcox_lambda(x):
+    log_x = np.log(x)
+    sum_log_x = log_x.sum()
+    best_lambda, best_llf = None, -np.inf
+    for lmbda in _boxcox_lambdas:
+        variance = _boxcox(x, lmbda).var()
+        if variance <= 0:
+            continue
+        llf = -len(x) / 2 * np.log(variance) + (lmbda - 1) * sum_log_x
+        if llf > best_llf:
+            best_lambda, best_llf = lmbda, llf
+    return best_lambda
+
+
+# Builds the 2-D array of transformed values, a row per transform, and the
+# names of the rows. Zeros are common in punct%, so log and Box-Cox are taken
+# of values + 1.
+def transform_matrix(values, exponents=(1, 2, 3, 4, 5), log=True, boxcox=True):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    exponents = np.asarray(exponents, dtype=float)
+
+    names = ['1/{:g}'.format(exponent) for exponent in exponents]
+    rows = [values[np.newaxis, :] ** (1 / exponents[:, np.newaxis])]
+    lambdas = [np.nan] * len(exponents)
+    if log:
+        names.append('log')
+        rows.append(np.log1p(values)[np.newaxis, :])
+        lambdas.append(np.nan)
+    if boxcox:
+        lmbda = _boxcox_lambda(values + 1)
+        names.append('boxcox')
+        rows.append(_boxcox(values + 1, lmbda)[np.newaxis, :])
+        lambdas.append(lmbda)
+    return names, np.concatenate(rows), lambdas
+
+
+# Counts every row of matrix into bins equal width bins spanning that row's
+# min to max, like pyplot.hist(..., bins=40). Returns the counts and the edges,
+# one row per transform.
+def binned_counts(matrix, bins=40):
+    low = matrix.min(axis=1, keepdims=True)
+    high = matrix.max(axis=1, keepdims=True)
+    width = np.where(high > low, high - low, 1.0)
+    index = np.floor((matrix - low) / width * bins).astype(np.int64)
+    np.clip(index, 0, bins - 1, out=index)
+    index += np.arange(len(matrix))[:, np.newaxis] * bins
+    counts = np.bincount(index.ravel(), minlength=len(matrix) * bins).reshape(len(matrix), bins)
+    edges = low + (high - low) * np.linspace(0, 1, bins + 1)[np.newaxis, :]
+    return counts, edges
+
+
+# Skewness and excess kurtosis of every row
+def shape_stats(matrix):
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    m2 = (centered ** 2).mean(axis=1)
+    m3 = (centered ** 3).mean(axis=1)
+    m4 = (centered ** 4).mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return m3 / m2 ** 1.5, m4 / m2 ** 2 - 3
+
+
+# Evaluates the transforms of one feature. Returns a DataFrame indexed by
+# transform name with skewness, kurtosis, the Jarque-Bera statistic (lower is
+# closer to normal) and the Box-Cox lambda, plus the binned counts and edges as
+# 2-D arrays in the same row order.
+def evaluate_transforms(values, exponents=(1, 2, 3, 4, 5), log=True, boxcox=True, bins=40):
+    names, matrix, lambdas = transform_matrix(values, exponents, log, boxcox)
+    skewness, kurtosis = shape_stats(matrix)
+    counts, edges = binned_counts(matrix, bins)
+    stats = pd.DataFrame({
+        'skewness': skewness,
+        'kurtosis': kurtosis,
+        'jarque_bera': matrix.shape[1] / 6 * (skewness ** 2 + kurtosis ** 2 / 4),
+        'lambda': lambdas,
+    }, index=pd.Index(names, name='transform'))
+    return stats, counts, edges
+
+
+# Name of the transform whose distribution is closest to normal
+def best_transform(stats):
+    return stats['jarque_bera'].idxmin()
+
+
+# Runs evaluate_transforms over several columns of a frame and returns one
+# stats table indexed by (feature, transform)
+def evaluate_features(data, columns, exponents=(1, 2, 3, 4, 5), log=True, boxcox=True, bins=40):
+    tables = {column: evaluate_transforms(data[column], exponents, log, boxcox, bins)[0]
+              for column in columns}
+    return pd.concat(tables, names=['feature'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rank power transforms of the SMS features.')
+    parser.add_argument('path', nargs='?', default='SMSSpamCollection.tsv')
+    parser.add_argument('--exponents', type=float, nargs='+', default=[1, 2, 3, 4, 5])
+    args = parser.parse_args()
+
+    data = add_features(read_corpus(args.path))
+    stats = evaluate_features(data, ['body_len', 'punct%'], args.exponents)
+    print(stats)
+    for feature in ['body_len', 'punct%']:
+        print('Best transform for {}: {}'.format(feature, best_transform(stats.loc[feature])))
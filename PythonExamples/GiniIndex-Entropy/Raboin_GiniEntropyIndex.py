@@ -4,21 +4,19 @@
 # In[2]:
 
 
-# Importing the required packages: numpy, pandas, and sklearn as mentioned previously 
+# Importing the required packages: numpy and sklearn as mentioned previously 
 import numpy as np 
-import pandas as pd 
-from sklearn.metrics import confusion_matrix 
 from sklearn.model_selection import train_test_split 
 from sklearn.tree import DecisionTreeClassifier 
-from sklearn.metrics import accuracy_score 
-from sklearn.metrics import classification_report 
+  
+from balance_data import BalanceDataset, load_balance_data
+from tree_metrics import format_report, model_metrics
+from tree_registry import DEFAULT_PARAMS, get_or_train
   
 # Function to import the data into the program using a web browser link to data file
+# The parsed data is cached locally, so only the first run needs the network
 def importdata(): 
-    balance_data = pd.read_csv( 
-'https://archive.ics.uci.edu/ml/machine-learning-'+
-'databases/balance-scale/balance-scale.data', 
-    sep= ',', header = None) 
+    balance_data = load_balance_data() 
       
     # Printing the shape of the data set for clear readability
     print ("Dataset Length: ", len(balance_data)) 
@@ -32,8 +30,10 @@ def importdata():
 def splitdataset(balance_data): 
   
     # Separating the target variable to determine left and right balance
-    X = balance_data.values[:, 1:5] 
-    Y = balance_data.values[:, 0] 
+    # The features come out as a uint8 matrix instead of an object array
+    dataset = BalanceDataset.from_frame(balance_data) 
+    X = dataset.features 
+    Y = dataset.decode(dataset.labels) 
   
     # Splitting the dataset into train and test for predictive values
     X_train, X_test, y_train, y_test = train_test_split(  
@@ -47,8 +47,8 @@ def splitdataset(balance_data):
 def train_using_gini(X_train, X_test, y_train): 
   
     # Creating the classifier object, max nodes are 3 with 5 leafs  minimum
-    clf_gini = DecisionTreeClassifier(criterion = "gini", 
-            random_state = 100,max_depth=3, min_samples_leaf=5) 
+    # (the hyperparameters are kept in tree_registry.DEFAULT_PARAMS) 
+    clf_gini = DecisionTreeClassifier(**DEFAULT_PARAMS['gini']) 
   
     # Performing training 
     clf_gini.fit(X_train, y_train) 
@@ -60,9 +60,7 @@ def tarin_using_entropy(X_train, X_test, y_train):
     # Decision tree with entropy 
     #Entropy is the measure of uncertainty in a variable
     #The higher the entropy, the more data there is
-    clf_entropy = DecisionTreeClassifier( 
-            criterion = "entropy", random_state = 100, 
-            max_depth = 3, min_samples_leaf = 5) 
+    clf_entropy = DecisionTreeClassifier(**DEFAULT_PARAMS['entropy']) 
   
     # Performing training 
     clf_entropy.fit(X_train, y_train) 
@@ -79,16 +77,19 @@ def prediction(X_test, clf_object):
     return y_pred 
       
 # Calculates level of accuracy 
+# Everything is worked out from one confusion matrix and returned as a dict
 def cal_accuracy(y_test, y_pred): 
+    metrics = model_metrics(y_test, y_pred) 
       
     print("Confusion Matrix: ", 
-        confusion_matrix(y_test, y_pred)) 
+        np.array(metrics['confusion_matrix'])) 
       
     print ("Accuracy : ", 
-    accuracy_score(y_test,y_pred)*100) 
+    metrics['accuracy']*100) 
       
     print("Report : ", 
-    classification_report(y_test, y_pred)) 
+    format_report(metrics)) 
+    return metrics 
   
 # Main Driver Code 
 def main(): 
@@ -96,8 +97,9 @@ def main():
     # use the above functions to build the dataset 
     data = importdata() 
     X, Y, X_train, X_test, y_train, y_test = splitdataset(data) 
-    clf_gini = train_using_gini(X_train, X_test, y_train) 
-    clf_entropy = tarin_using_entropy(X_train, X_test, y_train) 
+    # Fitted models are registered, so later runs load them instead of refitting
+    clf_gini = get_or_train(X_train, y_train, DEFAULT_PARAMS['gini']) 
+    clf_entropy = get_or_train(X_train, y_train, DEFAULT_PARAMS['entropy']) 
       
     # Operational Phase 
     print("Results Using Gini Index:") 
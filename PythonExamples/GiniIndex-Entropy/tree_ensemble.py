@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Trains the Gini and entropy trees, and a bagged forest of each, from one
+# BinnedData: the labels are encoded and the four features binned into uint8
+# codes once for every model instead of being sorted by every fit. Each node
+# then gets its class counts per bin from one bincount per feature. Bootstrap
+# samples are given to the trees as row weights (how often each row was
+# drawn), so they share the same binned arrays too. The fits run in a thread
+# pool; most of their time is spent in NumPy calls that release the GIL.
+#
+#     python tree_ensemble.py --rows 1000000 --estimators 10
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from numpy_tree import BinnedData, DecisionTree, synthetic_balance
+
+
+# Trees fitted on bootstrap samples, predicting the class with the highest
+# mean leaf probability, as sklearn's forests do
+class BaggedForest:
+
+    def __init__(self, trees):
+        self.trees = trees
+        self.classes_ = trees[0].classes_
+
+    def predict_proba(self, X):
+        proba = np.zeros((len(X), len(self.classes_)))
+        for tree in self.trees:
+            counts = tree.value_[tree.apply(X)]
+            proba += counts / counts.sum(axis=1, keepdims=True)
+        return proba / len(self.trees)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def __repr__(self):
+        return 'BaggedForest({} trees)'.format(len(self.trees))
+
+
+# How many times each of rows rows is drawn by each of n_estimators bootstrap
+# samples
+def bootstrap_weights(rows, n_estimators, random_state=100):
+    rng = np.random.default_rng(random_state)
+    return [np.bincount(rng.integers(0, rows, rows), minlength=rows)
+            for _ in range(n_estimators)]
+
+
+# Fits a tree of each criterion and a forest of n_estimators bagged trees of
+# each criterion on the same data, in workers threads. Returns a dict of
+# models named 'gini', 'gini_forest', 'entropy', 'entropy_forest' and so on.
+def train_models(X, y, criteria=('gini', 'entropy'), n_estimators=10, max_depth=3,
+                 min_samples_leaf=5, workers=None, random_state=100):
+    data = BinnedData(X, y)
+    samples = bootstrap_weights(len(data), n_estimators, random_state)
+    jobs = []
+    for criterion in criteria:
+        jobs.append((criterion, criterion, None))
+        jobs.extend((criterion + '_forest', criterion, weights) for weights in samples)
+
+    def fit(job):
+        name, criterion, weights = job
+        return DecisionTree(criterion, max_depth, min_samples_leaf).fit_binned(data, weights)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        trees = list(pool.map(fit, jobs))
+
+    models = {}
+    forests = {}
+    for (name, criterion, weights), tree in zip(jobs, trees):
+        if weights is None:
+            models[name] = tree
+        else:
+            forests.setdefault(name, []).append(tree)
+    for name, forest in forests.items():
+        models[name] = BaggedForest(forest)
+    return models
+
+
+# The same models fitted one after another, each sorting the data itself.
+# Bagged trees get the same bootstrap weights as in train_models, so the two
+# build the same trees and only the sharing of the binned data differs.
+def _train_models_separately(X, y, criteria=('gini', 'entropy'), n_estimators=10,
+                             max_depth=3, min_samples_leaf=5, random_state=100):
+    samples = bootstrap_weights(len(y), n_estimators, random_state)
+    models = {}
+    for criterion in criteria:
+        models[criterion] = DecisionTree(criterion, max_depth, min_samples_leaf).fit(X, y)
+        models[criterion + '_forest'] = BaggedForest([
+            DecisionTree(criterion, max_depth, min_samples_leaf).fit(X, y, sample_weight=weights)
+            for weights in samples])
+    return models
+
+
+def benchmark(rows=1000000, n_estimators=10, workers=None):
+    X, y = synthetic_balance(rows)
+    X = X.astype(np.uint8)
+    X_test, y_test = synthetic_balance(max(rows // 10, 1), seed=101)
+    results = {}
+    start = time.perf_counter()
+    separate = _train_models_separately(X, y, n_estimators=n_estimators)
+    results['separate'] = time.perf_counter() - start
+    start = time.perf_counter()
+    shared = train_models(X, y, n_estimators=n_estimators, workers=workers)
+    results['shared'] = time.perf_counter() - start
+    accuracy = {name: ((separate[name].predict(X_test) == y_test).mean() * 100,
+                       (model.predict(X_test) == y_test).mean() * 100)
+                for name, model in shared.items()}
+    return results, accuracy
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Train Gini/entropy trees and bagged forests from shared binned data.')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--estimators', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    results, accuracy = benchmark(args.rows, args.estimators, args.workers)
+    print('separate fits {:.2f}s, shared binned data in threads {:.2f}s ({:.1f}x)'.format(
+        results['separate'], results['shared'], results['separate'] / results['shared']))
+    for name, (separate, shared) in accuracy.items():
+        print('{}: {:.2f}% separate, {:.2f}% shared'.format(name, separate, shared))
+
+
+if __name__ == '__main__':
+    main()
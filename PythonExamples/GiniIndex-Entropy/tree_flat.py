@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Fitted decision trees exported to flat NumPy arrays and scored without
+# sklearn. Every leaf is made to point at itself with a threshold of +inf, so
+# scoring is exactly max_depth rounds of gathers over all rows with no check
+# for which rows have already reached a leaf: three rounds for the notebook's
+# max_depth=3 trees.
+#
+#     python tree_flat.py --rows 10000000
+
+import argparse
+import time
+
+import numpy as np
+
+
+class FlatTree:
+
+    def __init__(self, feature, threshold, left, right, value, classes, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.classes = classes
+        self.depth = depth
+        # left and right interleaved, so one gather at 2 * node + goes_right
+        # finds the next node
+        self.children = np.stack([left, right], axis=1).ravel().astype(np.intp)
+
+    # Exports a fitted sklearn DecisionTreeClassifier or numpy_tree.DecisionTree.
+    # value holds the index into classes of each node's majority class.
+    @classmethod
+    def from_tree(cls, clf):
+        if hasattr(clf, 'tree_'):
+            tree = clf.tree_
+            feature, threshold = tree.feature, tree.threshold
+            left, right = tree.children_left, tree.children_right
+            counts = tree.value[:, 0, :]
+        else:
+            feature, threshold = clf.feature_, clf.threshold_
+            left, right = clf.children_left_, clf.children_right_
+            counts = clf.value_
+        leaf = left < 0
+        nodes = np.arange(len(feature), dtype=np.int32)
+        return cls(feature=np.where(leaf, 0, feature).astype(np.intp),
+                   threshold=np.where(leaf, np.inf, threshold).astype(np.float64),
+                   left=np.where(leaf, nodes, left).astype(np.intp),
+                   right=np.where(leaf, nodes, right).astype(np.intp),
+                   value=counts.argmax(axis=1).astype(np.int32),
+                   classes=np.asarray(clf.classes_),
+                   depth=_depth(left, right))
+
+    # Leaf index of every row, max_depth rounds of gathers. Floating point
+    # input is compared as float32, the way sklearn compares it.
+    def apply(self, X):
+        X = np.asarray(X)
+        if X.dtype.kind == 'f':
+            X = X.astype(np.float32)
+        X = np.ascontiguousarray(X)
+        n_features = X.shape[1]
+        flat = X.ravel()
+        offsets = np.arange(len(X), dtype=np.intp) * n_features
+        node = np.zeros(len(X), dtype=np.intp)
+        for _ in range(self.depth):
+            goes_right = flat[offsets + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + goes_right]
+        return node
+
+    # Predicted classes, scored chunk_size rows at a time so the temporaries
+    # stay in cache
+    def predict(self, X, chunk_size=1 << 16):
+        X = np.asarray(X)
+        codes = np.empty(len(X), dtype=np.int32)
+        for start in range(0, len(X), chunk_size):
+            codes[start:start + chunk_size] = self.value[self.apply(X[start:start + chunk_size])]
+        return self.classes[codes]
+
+    def __repr__(self):
+        return 'FlatTree({} nodes, depth {})'.format(len(self.feature), self.depth)
+
+
+# Depth of the tree from its child arrays, counted in edges from the root
+def _depth(left, right):
+    depth = 0
+    level = np.array([0])
+    while True:
+        level = level[left[level] >= 0]
+        if not level.size:
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
+
+
+# Times clf.predict and the flat tree on rows synthetic balance-scale rows and
+# checks the two agree
+def benchmark(clf, rows=10000000, seed=100):
+    X = np.random.default_rng(seed).integers(1, 6, size=(rows, 4), dtype=np.uint8)
+    flat = FlatTree.from_tree(clf)
+    start = time.perf_counter()
+    expected = clf.predict(X)
+    sklearn_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predicted = flat.predict(X)
+    flat_seconds = time.perf_counter() - start
+    if not np.array_equal(expected, predicted):
+        raise AssertionError('flat tree predictions differ from clf.predict')
+    return sklearn_seconds, flat_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark flat-array tree scoring.')
+    parser.add_argument('--rows', type=int, default=10000000)
+    args = parser.parse_args()
+
+    from balance_data import load_balance_data
+    from Raboin_GiniEntropyIndex import splitdataset
+    from tree_registry import DEFAULT_PARAMS, get_or_train
+    X, Y, X_train, X_test, y_train, y_test = splitdataset(load_balance_data())
+    for criterion, params in DEFAULT_PARAMS.items():
+        clf = get_or_train(X_train, y_train, params)
+        sklearn_seconds, flat_seconds = benchmark(clf, args.rows)
+        print('{}: clf.predict {:.2f}s, flat tree {:.2f}s ({:.1f}x), same predictions'.format(
+            criterion, sklearn_seconds, flat_seconds, sklearn_seconds / flat_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Classification metrics worked out from a single confusion matrix, built with
+# np.bincount on integer encoded labels, instead of confusion_matrix,
+# accuracy_score and classification_report each going over the labels again.
+# evaluate_models scores the predictions of any number of models against the
+# same y_true with one bincount and returns plain dicts that convert to JSON.
+
+import json
+
+import numpy as np
+
+
+# Integer codes of y_true and every prediction array against one list of
+# labels, sorted unless labels is given. Returns (labels, true_codes,
+# pred_codes) where pred_codes has one row per prediction array. A value that
+# is not in labels raises ValueError.
+def encode_labels(y_true, predictions, labels=None):
+    y_true = np.asarray(y_true)
+    predictions = np.asarray(predictions).reshape(-1, len(y_true))
+    if labels is None:
+        labels = np.unique(np.concatenate([y_true, predictions.ravel()]))
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+
+    def encode(values):
+        positions = np.searchsorted(sorted_labels, values)
+        known = np.isin(values, labels)
+        if not known.all():
+            raise ValueError('y contains labels not in labels: {}'.format(
+                np.unique(values[~known]).tolist()))
+        return order[positions]
+
+    return labels, encode(y_true), encode(predictions)
+
+
+# Confusion matrices of every row of pred_codes, shape (models, labels, labels)
+# with true labels down the rows, from one bincount
+def confusion_matrices(true_codes, pred_codes, n_labels):
+    n_models = len(pred_codes)
+    cells = (np.arange(n_models)[:, None] * n_labels + true_codes) * n_labels + pred_codes
+    counts = np.bincount(cells.ravel(), minlength=n_models * n_labels * n_labels)
+    return counts.reshape(n_models, n_labels, n_labels)
+
+
+# Accuracy plus per-class and averaged precision, recall and F1 from one
+# confusion matrix. Scores with a zero denominator are 0, like sklearn's
+# zero_division default.
+def matrix_metrics(matrix, labels):
+    correct = np.diag(matrix).astype(np.float64)
+    support = matrix.sum(axis=1)
+    predicted = matrix.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(predicted > 0, correct / predicted, 0.0)
+        recall = np.where(support > 0, correct / support, 0.0)
+        f1 = np.where(precision + recall > 0,
+                      2 * precision * recall / (precision + recall), 0.0)
+    total = support.sum()
+    weights = support / total if total else np.zeros(len(support))
+
+    per_class = {}
+    for i, label in enumerate(labels):
+        per_class[str(label)] = {'precision': float(precision[i]), 'recall': float(recall[i]),
+                                 'f1': float(f1[i]), 'support': int(support[i])}
+    return {
+        'accuracy': float(correct.sum() / total) if total else 0.0,
+        'confusion_matrix': matrix.tolist(),
+        'labels': [str(label) for label in labels],
+        'per_class': per_class,
+        'macro_avg': {'precision': float(precision.mean()), 'recall': float(recall.mean()),
+                      'f1': float(f1.mean()), 'support': int(total)},
+        'weighted_avg': {'precision': float(precision @ weights),
+                         'recall': float(recall @ weights),
+                         'f1': float(f1 @ weights), 'support': int(total)},
+    }
+
+
+# Metrics of every model in predictions, a dict of name -> predicted labels,
+# all scored against y_true. Returns a dict of name -> matrix_metrics result.
+def evaluate_models(y_true, predictions, labels=None):
+    names = list(predictions)
+    if not names:
+        return {}
+    labels, true_codes, pred_codes = encode_labels(
+        y_true, [predictions[name] for name in names], labels)
+    matrices = confusion_matrices(true_codes, pred_codes, len(labels))
+    return {name: matrix_metrics(matrix, labels) for name, matrix in zip(names, matrices)}
+
+
+def model_metrics(y_true, y_pred, labels=None):
+    return evaluate_models(y_true, {'model': y_pred}, labels)['model']
+
+
+def to_json(results, indent=2):
+    return json.dumps(results, indent=indent)
+
+
+# Text table of one matrix_metrics result laid out like classification_report
+def format_report(metrics, digits=2):
+    width = max([len(label) for label in metrics['labels']] + [len('weighted avg')])
+    row = '{:>{width}}  {:>9} {:>9} {:>9} {:>9}\n'
+    line = '{:>{width}}  {:>9.{digits}f} {:>9.{digits}f} {:>9.{digits}f} {:>9}\n'
+    report = row.format('', 'precision', 'recall', 'f1-score', 'support', width=width) + '\n'
+    for label in metrics['labels']:
+        scores = metrics['per_class'][label]
+        report += line.format(label, scores['precision'], scores['recall'], scores['f1'],
+                              scores['support'], width=width, digits=digits)
+    report += '\n{:>{width}}  {:>9} {:>9} {:>9.{digits}f} {:>9}\n'.format(
+        'accuracy', '', '', metrics['accuracy'], metrics['macro_avg']['support'],
+        width=width, digits=digits)
+    for name, key in (('macro avg', 'macro_avg'), ('weighted avg', 'weighted_avg')):
+        scores = metrics[key]
+        report += line.format(name, scores['precision'], scores['recall'], scores['f1'],
+                              scores['support'], width=width, digits=digits)
+    return report
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Registry of fitted decision trees so scoring doesn't have to refit them.
+# Models are saved with joblib (uncompressed, so their arrays can be memory
+# mapped on load) under a name made of a hash of the training data, a hash of
+# the hyperparameters and the scikit-learn version that pickled them, so an
+# upgrade refits instead of loading a pickle from an older release.
+#
+#     python tree_registry.py train
+#     python tree_registry.py predict --criterion gini rows.csv
+#     echo 1,5,3,2 | python tree_registry.py predict --criterion entropy
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+REGISTRY_DIR = os.environ.get('TREE_REGISTRY_DIR',
+                              os.path.join(os.path.expanduser('~'), '.cache', 'tree_registry'))
+
+# The hyperparameters of the notebook's trees: train_using_gini and
+# tarin_using_entropy build their classifiers from these, and get_or_train
+# registers models under them, so this is the one place to change them
+DEFAULT_PARAMS = {
+    'gini': {'criterion': 'gini', 'random_state': 100, 'max_depth': 3, 'min_samples_leaf': 5},
+    'entropy': {'criterion': 'entropy', 'random_state': 100, 'max_depth': 3, 'min_samples_leaf': 5},
+}
+
+
+# Hash of a training set, the same whatever dtype the features were loaded as
+def dataset_hash(X, y):
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(np.asarray(X, dtype=np.int64)).tobytes())
+    digest.update('\0'.join(str(label) for label in y).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def params_hash(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _sklearn_version():
+    import sklearn
+    return sklearn.__version__
+
+
+def model_path(data_key, params, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, '{}-{}-sklearn{}.joblib'.format(
+        data_key, params_hash(params), _sklearn_version()))
+
+
+def save_model(clf, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    joblib.dump(clf, temp_path)
+    os.replace(temp_path, path)
+
+
+def load_model(path, mmap_mode='r'):
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+# Returns the registered model for this training set and hyperparameters,
+# fitting and registering it only if it isn't there yet
+def get_or_train(X_train, y_train, params, registry_dir=REGISTRY_DIR):
+    path = model_path(dataset_hash(X_train, y_train), params, registry_dir)
+    if os.path.exists(path):
+        return load_model(path)
+    from sklearn.tree import DecisionTreeClassifier
+    clf = DecisionTreeClassifier(**params)
+    clf.fit(X_train, y_train)
+    save_model(clf, path)
+    return clf
+
+
+# Path of the most recently registered model with these hyperparameters and
+# the installed scikit-learn, found without loading any data
+def latest_model_path(params, registry_dir=REGISTRY_DIR):
+    paths = glob.glob(os.path.join(registry_dir, '*-{}-sklearn{}.joblib'.format(
+        params_hash(params), glob.escape(_sklearn_version()))))
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime)
+
+
+# Registers the Gini and entropy trees for the splitdataset split
+def train_default_models(registry_dir=REGISTRY_DIR):
+    from balance_data import load_balance_data
+    from Raboin_GiniEntropyIndex import splitdataset
+    X, Y, X_train, X_test, y_train, y_test = splitdataset(load_balance_data())
+    data_key = dataset_hash(X_train, y_train)
+    paths = {}
+    for criterion, params in DEFAULT_PARAMS.items():
+        get_or_train(X_train, y_train, params, registry_dir)
+        paths[criterion] = model_path(data_key, params, registry_dir)
+    return paths
+
+
+# Reads rows of four comma separated features from a file object
+def read_rows(rows_file):
+    return np.loadtxt(rows_file, delimiter=',', dtype=np.int64, ndmin=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train or score registered decision trees.')
+    parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('train', help='register the Gini and entropy trees')
+    predict = commands.add_parser('predict', help='score rows from a file or stdin')
+    predict.add_argument('rows', nargs='?', help='CSV of LW,LD,RW,RD rows; stdin if left out')
+    predict.add_argument('--criterion', choices=sorted(DEFAULT_PARAMS), default='gini')
+    predict.add_argument('--model', help='path of a registered model to use')
+    predict.add_argument('--timing', action='store_true',
+                         help='print load and predict times to stderr')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        for path in train_default_models(args.registry_dir).values():
+            print(path)
+        return
+
+    start = time.perf_counter()
+    path = args.model or latest_model_path(DEFAULT_PARAMS[args.criterion], args.registry_dir)
+    if path is None:
+        path = train_default_models(args.registry_dir)[args.criterion]
+    clf = load_model(path)
+    loaded = time.perf_counter()
+    if args.rows:
+        with open(args.rows) as rows_file:
+            rows = read_rows(rows_file)
+    else:
+        rows = read_rows(sys.stdin)
+    predictions = clf.predict(rows)
+    done = time.perf_counter()
+    print('\n'.join(str(label) for label in predictions))
+    if args.timing:
+        print('load {:.1f} ms, read and predict {:.1f} ms'.format(
+            (loaded - start) * 1000, (done - loaded) * 1000), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Scoring service for the registered Gini and entropy trees. Clients send one
+# row per line over a local TCP socket ("gini 1,5,3,2") and get the predicted
+# class back on a line of its own. Requests are gathered into micro-batches,
+# flushed when a batch is full or its time window runs out, so predict is
+# called once per batch instead of once per row.
+#
+#     python tree_service.py serve --port 8765 --window 0.002
+#     python tree_service.py bench --windows 0 0.001 0.005
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+import numpy as np
+
+from tree_registry import DEFAULT_PARAMS, REGISTRY_DIR, latest_model_path, load_model
+from tree_registry import train_default_models
+
+
+# Collects rows submitted from any number of connections and predicts them
+# together, once max_batch rows are waiting or window seconds after the first
+# row of the batch arrived, whichever comes first
+class MicroBatcher:
+
+    def __init__(self, predict, max_batch=64, window=0.002):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self._rows = []
+        self._futures = []
+        self._timer = None
+
+    # Returns a future that gets the row's prediction
+    def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows.append(row)
+        self._futures.append(future)
+        if len(self._rows) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    # predict is run on the event loop itself: for these trees a batch takes
+    # well under a millisecond, less than handing it to an executor would. If
+    # the batch fails its rows are predicted one by one, so only the rows that
+    # fail on their own get the exception.
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        if not rows:
+            return
+        self.batches += 1
+        try:
+            predictions = self.predict(np.array(rows, dtype=np.uint8))
+        except Exception:
+            for row, future in zip(rows, futures):
+                self._predict_one(row, future)
+            return
+        for future, prediction in zip(futures, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+    def _predict_one(self, row, future):
+        try:
+            prediction = self.predict(np.array([row], dtype=np.uint8))[0]
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+            return
+        if not future.done():
+            future.set_result(prediction)
+
+
+# Registered model of every criterion, registering them first if needed
+def load_models(registry_dir=REGISTRY_DIR):
+    models = {}
+    for criterion, params in DEFAULT_PARAMS.items():
+        path = latest_model_path(params, registry_dir)
+        if path is None:
+            path = train_default_models(registry_dir)[criterion]
+        models[criterion] = load_model(path)
+    return models
+
+
+# "gini 1,5,3,2" -> ('gini', [1, 5, 3, 2]). The models get uint8 features,
+# so values outside 0..255 are rejected here instead of failing the batch.
+def _parse(line):
+    criterion, values = line.decode('ascii').split()
+    row = [int(value) for value in values.split(',')]
+    if len(row) != 4:
+        raise ValueError('expected 4 features, got {}'.format(len(row)))
+    if not all(0 <= value <= 255 for value in row):
+        raise ValueError('features must be between 0 and 255')
+    return criterion, row
+
+
+async def _handle(reader, writer, batchers):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                criterion, row = _parse(line)
+                if criterion not in batchers:
+                    raise ValueError('unknown model {!r}'.format(criterion))
+                reply = str(await batchers[criterion].submit(row))
+            except Exception as error:
+                reply = 'error {}'.format(error)
+            writer.write((reply + '\n').encode('ascii'))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host='127.0.0.1', port=8765, max_batch=64, window=0.002,
+                registry_dir=REGISTRY_DIR):
+    batchers = {criterion: MicroBatcher(clf.predict, max_batch, window)
+                for criterion, clf in load_models(registry_dir).items()}
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle(reader, writer, batchers), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+# One client connection sending its rows one at a time, each after the reply
+# to the previous one, and recording every round trip
+async def _client(host, port, rows, criterion, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for row in rows:
+            start = time.perf_counter()
+            writer.write('{} {}\n'.format(criterion, ','.join(map(str, row))).encode('ascii'))
+            await writer.drain()
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+# Sends requests random rows over concurrency connections at once and returns
+# throughput and p50/p99 latency
+async def generate_load(host='127.0.0.1', port=8765, requests=20000, concurrency=64,
+                        criterion='gini', seed=100):
+    rows = np.random.default_rng(seed).integers(1, 6, size=(requests, 4)).tolist()
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, rows[i::concurrency], criterion, latencies)
+                           for i in range(concurrency)])
+    seconds = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {'requests': len(latencies), 'seconds': seconds,
+            'throughput': len(latencies) / seconds,
+            'p50_ms': np.percentile(latencies, 50), 'p99_ms': np.percentile(latencies, 99)}
+
+
+def _run_server(host, port, max_batch, window, registry_dir):
+    asyncio.run(serve(host, port, max_batch, window, registry_dir))
+
+
+async def _wait_for_server(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+        else:
+            writer.close()
+            return
+
+
+# Starts a server process for each batch window in turn, plus one that
+# predicts every row on its own (max_batch=1), and runs the load generator
+# against it
+def benchmark(windows=(0, 0.001, 0.005), max_batch=64, requests=20000, concurrency=64,
+              host='127.0.0.1', port=8765, registry_dir=REGISTRY_DIR):
+    load_models(registry_dir)
+    results = []
+    for batch, window in [(1, 0)] + [(max_batch, window) for window in windows]:
+        server = multiprocessing.Process(target=_run_server,
+                                         args=(host, port, batch, window, registry_dir))
+        server.start()
+        try:
+            asyncio.run(_wait_for_server(host, port))
+            result = asyncio.run(generate_load(host, port, requests, concurrency))
+        finally:
+            server.terminate()
+            server.join()
+        result.update(max_batch=batch, window_ms=window * 1000)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve or load test micro-batched tree scoring.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_command = commands.add_parser('serve', help='run the scoring service')
+    serve_command.add_argument('--window', type=float, default=0.002,
+                               help='seconds to wait for a batch to fill')
+    bench = commands.add_parser('bench', help='load test the service at several batch windows')
+    bench.add_argument('--windows', nargs='+', type=float, default=[0, 0.001, 0.005])
+    bench.add_argument('--requests', type=int, default=20000)
+    bench.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.window, args.registry_dir))
+        return
+
+    results = benchmark(args.windows, args.max_batch, args.requests, args.concurrency,
+                        args.host, args.port, args.registry_dir)
+    for result in results:
+        print('max_batch {max_batch:3d} window {window_ms:4.1f} ms: {throughput:8.0f} req/s, '
+              'p50 {p50_ms:6.2f} ms, p99 {p99_ms:6.2f} ms'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Hyperparameter sweep for the Gini and entropy decision trees. Every
+# combination of criterion, max_depth, min_samples_leaf and random_state is
+# trained on the one split from splitdataset across a pool of worker
+# processes, and the results come back as a table ranked by accuracy.
+
+import argparse
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+from balance_data import load_balance_data
+from Raboin_GiniEntropyIndex import splitdataset
+from tree_metrics import evaluate_models, to_json
+
+# The split each worker trains on, handed over once by _start_worker instead
+# of being pickled with every job
+_split = None
+
+
+def _start_worker(X_train, X_test, y_train, y_test):
+    global _split
+    _split = (X_train, X_test, y_train, y_test)
+
+
+# Fits one combination on the worker's split and predicts the test rows. The
+# predictions are scored together in the parent.
+def _evaluate(params):
+    X_train, X_test, y_train, y_test = _split
+    clf = DecisionTreeClassifier(**params)
+    start = time.perf_counter()
+    clf.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    y_pred = clf.predict(X_test)
+    predict_seconds = time.perf_counter() - start
+    result = dict(params)
+    result.update(fit_seconds=fit_seconds, predict_seconds=predict_seconds)
+    return result, y_pred
+
+
+# Every combination of the given values as DecisionTreeClassifier keyword
+# arguments
+def parameter_grid(criteria=('gini', 'entropy'), max_depths=(2, 3, 4, 5, 6, None),
+                   min_samples_leafs=(1, 5, 10, 20), random_states=(100,)):
+    return [dict(criterion=criterion, max_depth=max_depth,
+                 min_samples_leaf=min_samples_leaf, random_state=random_state)
+            for criterion, max_depth, min_samples_leaf, random_state
+            in itertools.product(criteria, max_depths, min_samples_leafs, random_states)]
+
+
+# Trains every combination in grid on the split across workers processes
+# (all CPUs by default) and returns the results ranked by accuracy, with
+# faster fits first among ties. With metrics=True the full tree_metrics
+# results of every combination are returned too, in grid order.
+def sweep(X_train, X_test, y_train, y_test, grid=None, workers=None, metrics=False):
+    if grid is None:
+        grid = parameter_grid()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(X_train, X_test, y_train, y_test)) as pool:
+        evaluated = list(pool.map(_evaluate, grid, chunksize=max(1, len(grid) // 64)))
+    scores = evaluate_models(y_test, {i: y_pred for i, (_, y_pred) in enumerate(evaluated)})
+    results = []
+    for i, (result, _) in enumerate(evaluated):
+        result.update(accuracy=scores[i]['accuracy'] * 100,
+                      macro_f1=scores[i]['macro_avg']['f1'])
+        results.append(result)
+    results = pd.DataFrame(results)
+    results = results.sort_values(['accuracy', 'fit_seconds'], ascending=[False, True])
+    results = results.reset_index(drop=True)
+    if metrics:
+        return results, [scores[i] for i in range(len(grid))]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep decision tree hyperparameters.')
+    parser.add_argument('--criteria', nargs='+', default=['gini', 'entropy'])
+    parser.add_argument('--max-depths', nargs='+', type=int, default=[2, 3, 4, 5, 6])
+    parser.add_argument('--min-samples-leafs', nargs='+', type=int, default=[1, 5, 10, 20])
+    parser.add_argument('--random-states', nargs='+', type=int, default=[100])
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('--top', type=int, default=20, help='rows of the ranking to print')
+    parser.add_argument('--json', help='write the parameters and metrics of every combination here')
+    args = parser.parse_args()
+
+    X, Y, X_train, X_test, y_train, y_test = splitdataset(load_balance_data())
+    grid = parameter_grid(args.criteria, args.max_depths, args.min_samples_leafs,
+                          args.random_states)
+    start = time.perf_counter()
+    results, metrics = sweep(X_train, X_test, y_train, y_test, grid, args.workers, metrics=True)
+    print(results.head(args.top).to_string())
+    if args.json:
+        with open(args.json, 'w') as output:
+            output.write(to_json([{'params': params, 'metrics': scores}
+                                  for params, scores in zip(grid, metrics)]))
+    print('Evaluated {} combinations in {:.2f}s'.format(len(grid), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
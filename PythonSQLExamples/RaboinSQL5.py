@@ -198,12 +198,21 @@ connection.execute(s).fetchall()
 # In[12]:
 
 
-print("Eric Raboin")
+from cookie_shipping import ship_orders
+print(ship_orders(connection, [1, 2]))
+s = select([cookies.c.cookie_name, cookies.c.quantity])
+connection.execute(s).fetchall()
 
 
 # In[13]:
 
 
+print("Eric Raboin")
+
+
+# In[14]:
+
+
 #Saving data from Python without using a database is very possible in a number of ways. Python makes it easy to export
 #files and can be exported in many different formats. By doing that, you can create and then export local informataion without
 #having to rely on a database to store and keep the records of it. The disadvantage to that is that it becomes much more 
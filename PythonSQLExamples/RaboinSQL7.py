@@ -514,12 +514,34 @@ print(get_orders_by_customer('cakeeater', shipped=False, details=True))
 # In[44]:
 
 
+def iter_orders_by_customer(cust_name, shipped=None, details=False, page_size=1000):
+    query = session.query(Order.order_id, User.username, User.phone)
+    query = query.join(User)
+    if details:
+        query = query.add_columns(Cookie.cookie_name, LineItems.quantity,
+                                 LineItems.extended_cost)
+        query = query.join(LineItems).join(Cookie)
+        query = query.order_by(Order.order_id, LineItems.line_item_id)
+    else:
+        query = query.order_by(Order.order_id)
+    if shipped is not None:
+        query = query.filter(Order.shipped == shipped)
+    query = query.filter(User.username == cust_name)
+    return query.yield_per(page_size)
+
+for row in iter_orders_by_customer('cakeeater', details=True, page_size=1):
+    print(row)
+
+
+# In[45]:
+
+
 from sqlalchemy import text
 query = session.query(User).filter(text("username='cookiemon'"))
 print(query.all())
 
 
-# In[45]:
+# In[46]:
 
 
 #Creating custom made classes in Python seems like one of the more simple methods to create a class. It could be due to the 
@@ -530,7 +552,7 @@ print(query.all())
 #from the tables. For example, we used the cookie class to create the molasses cookie and were able to assign table properties.
 
 
-# In[46]:
+# In[47]:
 
 
 print("Eric Raboin SQL7")
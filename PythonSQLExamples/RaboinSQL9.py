@@ -187,6 +187,31 @@ ship_it(2)
 # In[10]:
 
 
+from sqlalchemy.orm import selectinload
+from cookie_models import count_queries
+def ship_it(order_id):
+    query = session.query(Order)
+    query = query.options(selectinload(Order.line_items).joinedload(LineItem.cookie))
+    order = query.filter(Order.order_id == order_id).one()
+    for li in order.line_items:
+        li.cookie.quantity = li.cookie.quantity - li.quantity
+    order.shipped = True
+    try:
+        session.commit()
+        print("shipped order ID: {}".format(order_id))
+    except IntegrityError as error:
+        print('ERROR: {!s}'.format(error.orig))
+        session.rollback()
+
+with count_queries(engine) as statements:
+    ship_it(2)
+selects = [s for s in statements if s.startswith('SELECT')]
+assert len(selects) == 2, 'ship_it should not lazy load line items or cookies'
+
+
+# In[11]:
+
+
 #A session or transaction rollback is the method used to revert information back to its previous state. When you commit a 
 #session, you are storing that committed information into the database. In some cases, there is a mistake with the 
 #information and instead of dealing with trying to overwrite it (which will cause data integrity errors), you would use 
@@ -196,7 +221,7 @@ ship_it(2)
 #solved by simply rolling back the information.
 
 
-# In[11]:
+# In[12]:
 
 
 print('Eric Raboin SQL9')
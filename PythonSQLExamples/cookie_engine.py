@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Engine factory for the cookie store. The notebooks all use
+# create_engine('sqlite:///:memory:'); create_cookie_engine does the same by
+# default, but given a file URL it sets up SQLite for a database that is shared
+# and kept: WAL journal mode, synchronous=NORMAL, a memory-mapped file, a
+# bigger page cache and a busy timeout, applied to every new connection from a
+# connect event. The tables from cookie_schema are created if missing.
+#
+#     python cookie_engine.py --path /tmp/cookies.db
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+
+from cookie_schema import metadata
+
+# SQLite's own defaults are journal_mode=DELETE, synchronous=FULL, no mmap,
+# a 2 MB cache and no busy timeout
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE = -64 * 1024  # negative means KiB, so 64 MB
+BUSY_TIMEOUT = 5000  # milliseconds
+
+
+def sqlite_url(path):
+    return 'sqlite:///' + os.path.abspath(path)
+
+
+def is_memory_url(url):
+    return make_url(url).database in (None, '', ':memory:')
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute('PRAGMA {} = {}'.format(name, value))
+    cursor.close()
+
+
+# Returns an engine for url with the cookie store tables created. For a SQLite
+# file the journal mode, synchronous level, mmap size, cache size and busy
+# timeout are set on every connection; None leaves SQLite's default. An
+# in-memory database only gets the cache size and busy timeout, the others
+# don't apply to it. Any other keyword arguments go to create_engine.
+def create_cookie_engine(url='sqlite:///:memory:', journal_mode='WAL', synchronous='NORMAL',
+                         mmap_size=MMAP_SIZE, cache_size=CACHE_SIZE, busy_timeout=BUSY_TIMEOUT,
+                         create_tables=True, **engine_args):
+    engine = create_engine(url, **engine_args)
+    if engine.dialect.name == 'sqlite':
+        pragmas = {'busy_timeout': busy_timeout, 'cache_size': cache_size}
+        if not is_memory_url(url):
+            pragmas.update(journal_mode=journal_mode, synchronous=synchronous,
+                           mmap_size=mmap_size)
+        pragmas = {name: value for name, value in pragmas.items() if value is not None}
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):
+            _apply_pragmas(dbapi_connection, pragmas)
+
+    if create_tables:
+        metadata.create_all(engine)
+    return engine
+
+
+# Current values of the pragmas create_cookie_engine sets, for checking what a
+# connection actually got
+def read_pragmas(connection):
+    return {name: connection.execute('PRAGMA {}'.format(name)).scalar()
+            for name in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size',
+                         'busy_timeout')}
+
+
+def _remove_database(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+# Times the same work against an in-memory database, a file with SQLite's
+# default settings and a file with the tuned ones: a bulk inventory insert,
+# shipping orders one transaction at a time with ship_it, and order lookups
+def benchmark(path, cookie_rows=200000, line_count=20000, lookups=200):
+    from cookie_loader import load_cookies, synthetic_inventory
+    from cookie_orders import get_orders_by_customer
+    from cookie_shipping import _load_orders, ship_it
+    modes = [
+        ('memory', 'sqlite:///:memory:', {}),
+        ('file, defaults', sqlite_url(path),
+         dict(journal_mode=None, synchronous=None, mmap_size=None, cache_size=None)),
+        ('file, tuned', sqlite_url(path), {}),
+    ]
+    for name, url, settings in modes:
+        _remove_database(path)
+        engine = create_cookie_engine(url, **settings)
+        connection = engine.connect()
+        order_ids = _load_orders(connection, line_count)
+
+        stats = load_cookies(connection, synthetic_inventory(cookie_rows))
+
+        start = time.perf_counter()
+        for order_id in order_ids:
+            ship_it(connection, order_id)
+        ship_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            rows = get_orders_by_customer(connection, 'cookiemon')
+        lookup_seconds = time.perf_counter() - start
+        assert len(rows) == len(order_ids)
+
+        pragmas = read_pragmas(connection)
+        connection.close()
+        engine.dispose()
+        print('{:>15}: insert {:>9,.0f} rows/s  ship_it {:>7,.0f} orders/s  '
+              'lookup {:>6,.0f} queries/s  (journal_mode={journal_mode}, '
+              'synchronous={synchronous})'.format(
+                  name, stats['rows_per_second'], len(order_ids) / ship_seconds,
+                  lookups / lookup_seconds, **pragmas))
+    _remove_database(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the cookie store in memory and in a SQLite file.')
+    parser.add_argument('--path', default=os.path.join(tempfile.gettempdir(), 'cookie_bench.db'),
+                        help='database file to create; it is deleted afterwards')
+    parser.add_argument('--cookies', type=int, default=200000)
+    parser.add_argument('--line-items', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+    benchmark(args.path, args.cookies, args.line_items, args.lookups)
+
+
+if __name__ == '__main__':
+    main()
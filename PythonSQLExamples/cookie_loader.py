@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Streaming loader for the cookies inventory. Rows come from any iterable of
+# dicts or from a CSV/TSV file with a header row, and are inserted in fixed
+# size chunks inside one transaction so memory stays bounded however large
+# the catalog is.
+
+import argparse
+import csv
+import time
+from decimal import Decimal
+from itertools import islice
+
+from sqlalchemy import Integer, Numeric
+
+from cookie_engine import create_cookie_engine
+from cookie_schema import cookies
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Works out how to convert a raw value for a column once, so the per-row work
+# is a single call. Blank strings from a CSV become NULL. Numeric columns go
+# straight to float on databases like SQLite that would convert a Decimal to
+# float anyway.
+def _converter(column, dialect):
+    if isinstance(column.type, Integer):
+        convert = int
+    elif isinstance(column.type, Numeric):
+        convert = Decimal if dialect.supports_native_decimal else float
+    else:
+        return lambda value: None if value == '' else value
+
+    def to_type(value):
+        if value is None or value == '':
+            return None
+        return convert(value)
+    return to_type
+
+
+# Cookies columns for a chunk of rows: the names already in use plus any keys
+# seen for the first time, in the order they appear, so for a CSV they follow
+# its header. Keys that aren't columns of the table raise ValueError rather
+# than being dropped, so a header typo like Quantity doesn't load every
+# quantity as NULL.
+def _column_names(rows, names=()):
+    keys = set().union(*rows)
+    if None in keys:
+        raise ValueError('an inventory row has more fields than the header')
+    unknown = sorted(key for key in keys if key not in cookies.c)
+    if unknown:
+        raise ValueError('not columns of cookies: {}'.format(', '.join(map(repr, unknown))))
+    names = list(names)
+    new_keys = keys.difference(names)
+    for row in rows:
+        if not new_keys:
+            break
+        for key in row:
+            if key in new_keys:
+                names.append(key)
+                new_keys.discard(key)
+    if not names:
+        raise ValueError('inventory rows have no columns')
+    return names
+
+
+# Converts a chunk of rows column by column and hands back dicts ready for
+# executemany
+def _convert_chunk(names, converters, chunk):
+    columns = zip(*([row.get(name) for name in names] for row in chunk))
+    converted = [list(map(convert, values)) for convert, values in zip(converters, columns)]
+    return [dict(zip(names, values)) for values in zip(*converted)]
+
+
+# Opens a CSV or TSV file as an iterator of dicts, picking the delimiter from
+# the file extension
+def read_inventory_file(path):
+    delimiter = '\t' if path.lower().endswith('.tsv') else ','
+    with open(path, newline='') as inventory_file:
+        for row in csv.DictReader(inventory_file, delimiter=delimiter):
+            yield row
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Loads cookie rows into the cookies table chunk_size rows at a time. rows can
+# be an iterable of dicts or a path to a CSV/TSV file. Returns a dict with the
+# row count, elapsed seconds, rows per second and peak RSS in KB (None where
+# the resource module is not available). Rows with keys that aren't cookies
+# columns raise ValueError and roll the whole load back.
+def load_cookies(connection, rows, chunk_size=10000):
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1, got {}'.format(chunk_size))
+    if isinstance(rows, str):
+        rows = read_inventory_file(rows)
+    rows = iter(rows)
+
+    start = time.perf_counter()
+    loaded = 0
+    first_chunk = list(islice(rows, chunk_size))
+    if first_chunk:
+        names = []
+        converters = []
+        ins = cookies.insert()
+        with connection.begin():
+            chunk = first_chunk
+            while chunk:
+                chunk_names = _column_names(chunk, names)
+                converters.extend(_converter(cookies.c[name], connection.dialect)
+                                  for name in chunk_names[len(names):])
+                names = chunk_names
+                connection.execute(ins, _convert_chunk(names, converters, chunk))
+                loaded += len(chunk)
+                chunk = list(islice(rows, chunk_size))
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': loaded,
+        'seconds': seconds,
+        'rows_per_second': loaded / seconds if seconds else 0.0,
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+
+# Yields row_count made up inventory rows, with quantity and unit_cost as
+# strings the same way the notebooks write them
+def synthetic_inventory(row_count):
+    for i in range(row_count):
+        yield {
+            'cookie_name': 'cookie {}'.format(i),
+            'cookie_recipe_url': 'http://some.aweso.me/cookie/{}.html'.format(i),
+            'cookie_sku': 'SKU{:07d}'.format(i),
+            'quantity': str(i % 500),
+            'unit_cost': '{}.{:02d}'.format(i % 5, i % 100),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk load the cookies inventory.')
+    parser.add_argument('path', nargs='?',
+                        help='CSV/TSV file to load; made up rows are used if left out')
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='number of made up rows to load when no file is given')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--database', default='sqlite:///:memory:')
+    args = parser.parse_args()
+
+    engine = create_cookie_engine(args.database)
+    connection = engine.connect()
+    rows = args.path if args.path else synthetic_inventory(args.rows)
+    stats = load_cookies(connection, rows, chunk_size=args.chunk_size)
+    print('Loaded {rows} rows in {seconds:.2f}s ({rows_per_second:,.0f} rows/s), '
+          'peak RSS {peak_rss_kb} KB'.format(**stats))
+
+
+if __name__ == '__main__':
+    main()
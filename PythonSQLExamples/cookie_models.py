@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# ORM classes for the cookie store from RaboinSQL9, mapped onto the shared
+# tables in cookie_schema so Core and ORM code work against the same schema.
+
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, backref, sessionmaker, selectinload
+
+from cookie_engine import create_cookie_engine
+from cookie_schema import metadata, cookies, users, orders, line_items
+
+Base = declarative_base(metadata=metadata)
+
+class Cookie(Base):
+    __table__ = cookies
+
+    def __init__(self, name, recipe_url=None, sku=None, quantity=0, unit_cost=0.00):
+        self.cookie_name = name
+        self.cookie_recipe_url = recipe_url
+        self.cookie_sku = sku
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+
+    def __repr__(self):
+        return ("Cookie(cookie_name='{self.cookie_name}', "
+                "cookie_recipe_url='{self.cookie_recipe_url}', "
+                "cookie_sku='{self.cookie_sku}', "
+                "quantity={self.quantity}, "
+                "unit_cost={self.unit_cost})".format(self=self))
+
+class User(Base):
+    __table__ = users
+
+    def __init__(self, username, email_address, phone, password):
+        self.username = username
+        self.email_address = email_address
+        self.phone = phone
+        self.password = password
+
+    def __repr__(self):
+        return ("User(username='{self.username}', "
+                "email_address='{self.email_address}', "
+                "phone='{self.phone}', "
+                "password='{self.password}')".format(self=self))
+
+class Order(Base):
+    __table__ = orders
+
+    user = relationship("User", backref=backref('orders', order_by=orders.c.order_id))
+
+    def __repr__(self):
+        return ("Order(user_id={self.user_id}, "
+                "shipped={self.shipped})".format(self=self))
+
+class LineItem(Base):
+    __table__ = line_items
+    line_item_id = line_items.c.line_items_id
+
+    order = relationship("Order", backref=backref('line_items', order_by=line_items.c.line_items_id))
+    cookie = relationship("Cookie", uselist=False)
+
+    def __repr__(self):
+        return ("LineItems(order_id={self.order_id}, "
+                "cookie_id={self.cookie_id}, "
+                "quantity={self.quantity}, "
+                "extended_cost={self.extended_cost})".format(self=self))
+
+
+# Loads an order with its line items and their cookies in two SELECTs (the
+# order, then the line items joined to cookies) however many lines it has
+def load_order_for_shipping(session, order_id):
+    query = session.query(Order)
+    query = query.options(selectinload(Order.line_items).joinedload(LineItem.cookie))
+    return query.filter(Order.order_id == order_id).one_or_none()
+
+
+# ship_it from RaboinSQL9 on top of load_order_for_shipping, so touching
+# li.cookie never triggers a lazy load. Returns True if the order shipped.
+def ship_it(session, order_id):
+    order = load_order_for_shipping(session, order_id)
+    if order is None:
+        return False
+    for li in order.line_items:
+        li.cookie.quantity = li.cookie.quantity - li.quantity
+    order.shipped = True
+    try:
+        session.commit()
+        return True
+    except IntegrityError:
+        session.rollback()
+        return False
+
+
+# Records every statement sent to the database while the block runs, so
+# callers can check how many queries something took
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+# Ships orders of growing size and fails if the number of SELECTs grows with
+# the number of line items
+def check_ship_it_queries(line_counts=(1, 10, 100, 1000)):
+    engine = create_cookie_engine()
+    session = sessionmaker(bind=engine)()
+    cookiemon = User('cookiemon', 'mon@cookie.com', '111-111-1111', 'password')
+    session.add(cookiemon)
+    for line_count in line_counts:
+        order = Order(user=cookiemon)
+        for i in range(line_count):
+            cookie = Cookie('cookie {}'.format(i), quantity=1, unit_cost=0.50)
+            LineItem(order=order, cookie=cookie, quantity=1, extended_cost=0.50)
+        session.add(order)
+        session.commit()
+        order_id = order.order_id
+        session.expunge_all()
+
+        start = time.perf_counter()
+        with count_queries(engine) as statements:
+            assert ship_it(session, order_id)
+        seconds = time.perf_counter() - start
+        selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+        assert len(selects) == 2, 'ship_it ran {} SELECTs for {} line items'.format(
+            len(selects), line_count)
+        print('{:>5} line items: {} SELECTs, {} statements, {:.2f} ms'.format(
+            line_count, len(selects), len(statements), seconds * 1000))
+
+
+if __name__ == '__main__':
+    check_ship_it_queries()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Customer order lookups for the cookie store. get_orders_by_customer only has
+# four query shapes (filtering on shipped or not, with or without details), so
+# each shape is built and compiled once and reused with bound parameters.
+# iter_orders_by_customer pages through the same shapes with keyset
+# pagination for customers whose history is too big to fetch in one go.
+
+import time
+
+from sqlalchemy import and_, bindparam, insert, or_, select
+
+from cookie_engine import create_cookie_engine
+from cookie_schema import cookies, users, orders, line_items
+
+_statement_cache = {}
+
+
+# Builds the select for one shape, with cust_name and shipped left as bound
+# parameters
+def _orders_statement(filter_shipped, details):
+    columns = [orders.c.order_id, users.c.username, users.c.phone]
+    joins = users.join(orders)
+    if details:
+        columns.extend([cookies.c.cookie_name, line_items.c.quantity, line_items.c.extended_cost])
+        joins = joins.join(line_items).join(cookies)
+    cust_orders = select(columns)
+    cust_orders = cust_orders.select_from(joins).where(users.c.username == bindparam('cust_name'))
+    if filter_shipped:
+        cust_orders = cust_orders.where(orders.c.shipped == bindparam('shipped'))
+    return cust_orders
+
+
+# Returns the compiled statement for a shape, compiling it for this
+# connection's dialect the first time it is asked for
+def _compiled_orders_statement(connection, filter_shipped, details):
+    key = (connection.dialect, filter_shipped, details)
+    compiled = _statement_cache.get(key)
+    if compiled is None:
+        statement = _orders_statement(filter_shipped, details)
+        compiled = _statement_cache[key] = statement.compile(dialect=connection.dialect)
+    return compiled
+
+
+def get_orders_by_customer(connection, cust_name, shipped=None, details=False):
+    compiled = _compiled_orders_statement(connection, shipped is not None, details)
+    params = {'cust_name': cust_name}
+    if shipped is not None:
+        params['shipped'] = shipped
+    return connection.execute(compiled, params).fetchall()
+
+
+# Builds one page of a shape, ordered by (order_id, line_items_id) and
+# optionally starting after the last key of the previous page
+def _orders_page_statement(filter_shipped, details, after):
+    cust_orders = _orders_statement(filter_shipped, details)
+    if details:
+        cust_orders = cust_orders.column(line_items.c.line_items_id)
+        cust_orders = cust_orders.order_by(orders.c.order_id, line_items.c.line_items_id)
+        if after:
+            cust_orders = cust_orders.where(or_(
+                orders.c.order_id > bindparam('last_order_id'),
+                and_(orders.c.order_id == bindparam('last_order_id'),
+                     line_items.c.line_items_id > bindparam('last_line_items_id'))
+            ))
+    else:
+        cust_orders = cust_orders.order_by(orders.c.order_id)
+        if after:
+            cust_orders = cust_orders.where(orders.c.order_id > bindparam('last_order_id'))
+    return cust_orders.limit(bindparam('page_size'))
+
+
+def _compiled_orders_page_statement(connection, filter_shipped, details, after):
+    key = (connection.dialect, filter_shipped, details, 'page', after)
+    compiled = _statement_cache.get(key)
+    if compiled is None:
+        statement = _orders_page_statement(filter_shipped, details, after)
+        compiled = _statement_cache[key] = statement.compile(dialect=connection.dialect)
+    return compiled
+
+
+# Yields the same rows as get_orders_by_customer, fetching page_size rows at a
+# time so memory stays flat however long the customer's history is. With
+# details=True each row also carries line_items_id as its last column, which is
+# the second half of the page key. page_size is checked here rather than on the
+# first next(), since SQLite reads a negative LIMIT as no limit.
+def iter_orders_by_customer(connection, cust_name, shipped=None, details=False,
+                            page_size=1000):
+    if page_size < 1:
+        raise ValueError('page_size must be at least 1, got {}'.format(page_size))
+    return _iter_orders_pages(connection, cust_name, shipped, details, page_size)
+
+
+def _iter_orders_pages(connection, cust_name, shipped, details, page_size):
+    params = {'cust_name': cust_name, 'page_size': page_size}
+    if shipped is not None:
+        params['shipped'] = shipped
+    compiled = _compiled_orders_page_statement(connection, shipped is not None, details, False)
+    while True:
+        page = connection.execute(compiled, params).fetchall()
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        params['last_order_id'] = last.order_id
+        if details:
+            params['last_line_items_id'] = last.line_items_id
+        compiled = _compiled_orders_page_statement(connection, shipped is not None, details, True)
+
+
+# The notebook version from RaboinSQL2, which builds and compiles the select on
+# every call. Only kept for the benchmark.
+def _get_orders_by_customer_rebuilt(connection, cust_name, shipped=None, details=False):
+    columns = [orders.c.order_id, users.c.username, users.c.phone]
+    joins = users.join(orders)
+    if details:
+        columns.extend([cookies.c.cookie_name, line_items.c.quantity, line_items.c.extended_cost])
+        joins = joins.join(line_items).join(cookies)
+    cust_orders = select(columns)
+    cust_orders = cust_orders.select_from(joins).where(users.c.username == cust_name)
+    if shipped is not None:
+        cust_orders = cust_orders.where(orders.c.shipped == shipped)
+    return connection.execute(cust_orders).fetchall()
+
+
+# Loads the customers, cookies and orders used in RaboinSQL2
+def _load_sample_orders(connection):
+    connection.execute(insert(users), [
+        {'username': 'cookiemon', 'email_address': 'mon@cookie.com',
+         'phone': '111-111-1111', 'password': 'password'},
+        {'username': 'cakeeater', 'email_address': 'cakeeater@cake.com',
+         'phone': '222-222-2222', 'password': 'password'},
+        {'username': 'pieguy', 'email_address': 'guy@pie.com',
+         'phone': '333-333-3333', 'password': 'password'},
+    ])
+    connection.execute(insert(cookies), [
+        {'cookie_name': 'chocolate chip', 'cookie_sku': 'CC01', 'quantity': 12, 'unit_cost': 0.50},
+        {'cookie_name': 'dark chocolate chip', 'cookie_sku': 'CC02', 'quantity': 1, 'unit_cost': 0.75},
+        {'cookie_name': 'peanut butter', 'cookie_sku': 'PB01', 'quantity': 24, 'unit_cost': 0.25},
+        {'cookie_name': 'oatmeal raisin', 'cookie_sku': 'EWW01', 'quantity': 100, 'unit_cost': 1.00},
+    ])
+    connection.execute(insert(orders), [
+        {'order_id': 1, 'user_id': 1},
+        {'order_id': 2, 'user_id': 2},
+    ])
+    connection.execute(insert(line_items), [
+        {'order_id': 1, 'cookie_id': 1, 'quantity': 2, 'extended_cost': 1.00},
+        {'order_id': 1, 'cookie_id': 3, 'quantity': 12, 'extended_cost': 3.00},
+        {'order_id': 2, 'cookie_id': 1, 'quantity': 24, 'extended_cost': 12.00},
+        {'order_id': 2, 'cookie_id': 4, 'quantity': 6, 'extended_cost': 6.00},
+    ])
+
+
+# Times calls of the rebuilt and cached lookups, cycling through every shape
+def benchmark(calls=100000):
+    engine = create_cookie_engine()
+    connection = engine.connect()
+    _load_sample_orders(connection)
+
+    variants = [(shipped, details) for shipped in (None, True, False) for details in (False, True)]
+    for shipped, details in variants:
+        assert (get_orders_by_customer(connection, 'cakeeater', shipped, details) ==
+                _get_orders_by_customer_rebuilt(connection, 'cakeeater', shipped, details))
+
+    for name, lookup in (('rebuilt', _get_orders_by_customer_rebuilt),
+                         ('cached', get_orders_by_customer)):
+        start = time.perf_counter()
+        for i in range(calls):
+            shipped, details = variants[i % len(variants)]
+            lookup(connection, 'cakeeater', shipped, details)
+        seconds = time.perf_counter() - start
+        print('{:>8}: {} calls in {:.2f}s, {:.1f} us per call'.format(
+            name, calls, seconds, seconds / calls * 1e6))
+
+
+if __name__ == '__main__':
+    benchmark()
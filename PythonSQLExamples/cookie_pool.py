@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Pooled access to the cookie store for code that runs on several threads,
+# instead of one engine.connect() shared by everything. A SQLite file gets a
+# QueuePool, so each thread checks out its own connection and WAL lets readers
+# run alongside the writer. An in-memory database exists only inside its one
+# connection, so it gets a StaticPool and checkouts take turns on a lock.
+#
+# run_load drives a mix of order lookups, ship_it, inventory inserts and
+# report queries from worker threads and reports throughput, latency
+# percentiles and "database is locked" errors.
+#
+#     python cookie_pool.py --threads 1 2 4 8 16
+
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from cookie_engine import _remove_database, create_cookie_engine, is_memory_url, sqlite_url
+from cookie_orders import get_orders_by_customer
+from cookie_reports import (create_inventory_valuation, create_user_order_stats,
+                            inventory_value, orders_per_user)
+from cookie_schema import cookies, users, orders, line_items
+from cookie_shipping import ship_it
+
+
+class CookieStore:
+
+    # pool_size connections (plus up to max_overflow more when they are all
+    # out) for a file, waiting up to pool_timeout seconds for one. Other
+    # keyword arguments go to create_cookie_engine.
+    def __init__(self, url='sqlite:///:memory:', pool_size=8, max_overflow=0, pool_timeout=30,
+                 **settings):
+        connect_args = {'check_same_thread': False}
+        if is_memory_url(url):
+            self.engine = create_cookie_engine(url, poolclass=StaticPool,
+                                               connect_args=connect_args, **settings)
+            self._lock = threading.Lock()
+        else:
+            self.engine = create_cookie_engine(url, poolclass=QueuePool, pool_size=pool_size,
+                                               max_overflow=max_overflow,
+                                               pool_timeout=pool_timeout,
+                                               connect_args=connect_args, **settings)
+            self._lock = None
+
+    # Checks a connection out for the with block and returns it to the pool
+    # afterwards
+    @contextmanager
+    def connect(self):
+        if self._lock is None:
+            with self.engine.connect() as connection:
+                yield connection
+        else:
+            with self._lock, self.engine.connect() as connection:
+                yield connection
+
+    def dispose(self):
+        self.engine.dispose()
+
+
+def _is_locked_error(error):
+    return 'database is locked' in str(error)
+
+
+# Customers, a well stocked catalog and unshipped orders of lines_per_order
+# line items each, plus the report rollups and their triggers
+def seed_store(store, user_count=100, cookie_count=1000, order_count=20000, lines_per_order=3,
+               seed=100):
+    rng = random.Random(seed)
+    with store.connect() as connection:
+        with connection.begin():
+            connection.execute(insert(users), [
+                {'username': 'user{}'.format(i), 'email_address': 'user{}@cookie.com'.format(i),
+                 'phone': '111-111-1111', 'password': 'password'}
+                for i in range(user_count)])
+            connection.execute(insert(cookies), [
+                {'cookie_name': 'cookie {}'.format(i), 'cookie_sku': 'SKU{}'.format(i),
+                 'quantity': order_count * lines_per_order, 'unit_cost': 0.50}
+                for i in range(cookie_count)])
+            connection.execute(insert(orders), [
+                {'order_id': i, 'user_id': rng.randint(1, user_count)}
+                for i in range(1, order_count + 1)])
+            connection.execute(insert(line_items), [
+                {'order_id': i, 'cookie_id': rng.randint(1, cookie_count),
+                 'quantity': 1, 'extended_cost': 0.50}
+                for i in range(1, order_count + 1) for _ in range(lines_per_order)])
+        create_inventory_valuation(connection)
+        create_user_order_stats(connection)
+
+
+def _lookup(connection, rng, state):
+    get_orders_by_customer(connection, 'user{}'.format(rng.randrange(state['users'])),
+                           details=rng.random() < 0.5)
+
+
+def _ship(connection, rng, state):
+    ship_it(connection, next(state['orders_to_ship']))
+
+
+def _insert(connection, rng, state):
+    with connection.begin():
+        connection.execute(insert(cookies), [
+            {'cookie_name': 'new cookie {}'.format(rng.random()), 'quantity': 10,
+             'unit_cost': 0.75}
+            for _ in range(5)])
+
+
+def _report(connection, rng, state):
+    inventory_value(connection)
+    orders_per_user(connection)
+
+
+# Operations of the load mix: name -> (weight, function(connection, rng, state))
+DEFAULT_MIX = {'lookup': (60, _lookup), 'ship': (20, _ship), 'insert': (15, _insert),
+               'report': (5, _report)}
+
+
+# Runs operations_per_thread operations, picked from mix by weight, on each of
+# threads threads against store. Returns overall and per operation counts,
+# latency percentiles in ms and the number of "database is locked" errors.
+def run_load(store, threads, operations_per_thread=500, mix=DEFAULT_MIX, user_count=100,
+             seed=100):
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    state = {'users': user_count, 'orders_to_ship': itertools.count(1)}
+    results = []
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        for name in rng.choices(names, weights, k=operations_per_thread):
+            start = time.perf_counter()
+            outcome = 'ok'
+            try:
+                with store.connect() as connection:
+                    mix[name][1](connection, rng, state)
+            except OperationalError as error:
+                outcome = 'locked' if _is_locked_error(error) else 'error'
+            results.append((name, time.perf_counter() - start, outcome))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    def summarize(rows):
+        latencies = np.array([latency for _, latency, _ in rows]) * 1000
+        return {'operations': len(rows),
+                'locked': sum(outcome == 'locked' for _, _, outcome in rows),
+                'errors': sum(outcome == 'error' for _, _, outcome in rows),
+                'p50_ms': np.percentile(latencies, 50), 'p95_ms': np.percentile(latencies, 95),
+                'p99_ms': np.percentile(latencies, 99)}
+
+    summary = summarize(results)
+    summary.update(threads=threads, seconds=seconds, throughput=len(results) / seconds)
+    summary['by_operation'] = {name: summarize([row for row in results if row[0] == name])
+                               for name in names if any(row[0] == name for row in results)}
+    return summary
+
+
+# Runs the load mix at each thread count against a fresh in-memory store and a
+# fresh file store
+def benchmark(path, thread_counts=(1, 2, 4, 8, 16), operations_per_thread=500, busy_timeout=5000):
+    for mode, url in (('memory', 'sqlite:///:memory:'), ('file', sqlite_url(path))):
+        for threads in thread_counts:
+            _remove_database(path)
+            store = CookieStore(url, pool_size=threads, busy_timeout=busy_timeout)
+            seed_store(store)
+            summary = run_load(store, threads, operations_per_thread)
+            store.dispose()
+            print('{mode:>6} {threads:>3} threads: {throughput:>6,.0f} ops/s  '
+                  'p50 {p50_ms:6.2f} ms  p95 {p95_ms:7.2f} ms  p99 {p99_ms:7.2f} ms  '
+                  'locked {locked:>4}  errors {errors:>3}'.format(mode=mode, **summary))
+    _remove_database(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the cookie store from many threads.')
+    parser.add_argument('--path', default=os.path.join(tempfile.gettempdir(), 'cookie_load.db'),
+                        help='database file to create; it is deleted afterwards')
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--operations', type=int, default=500, help='operations per thread')
+    parser.add_argument('--busy-timeout', type=int, default=5000,
+                        help='milliseconds SQLite waits for a lock; 0 shows the raw contention')
+    args = parser.parse_args()
+    benchmark(args.path, args.threads, args.operations, args.busy_timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Summary tables for the cookie store reports, kept up to date by SQLite
+# triggers so the dashboards read a few rows instead of scanning the catalog
+# or re-aggregating every order.
+# Triggers fire for every write, whether it comes from Core, the ORM, or
+# ship_it/ship_orders decrementing stock.
+
+import random
+import time
+
+from sqlalchemy import (MetaData, Table, Column, Integer, Numeric, select, update, cast,
+                        func, text)
+
+from cookie_engine import create_cookie_engine
+from cookie_schema import cookies, users, orders, line_items
+from cookie_loader import load_cookies
+from cookie_shipping import ship_orders
+
+report_metadata = MetaData()
+
+# Per-cookie quantity and inv_cost, the same cast(quantity * unit_cost,
+# Numeric(12, 2)) as the RaboinSQL2 report
+inventory_valuation = Table('inventory_valuation', report_metadata,
+    Column('cookie_id', Integer(), primary_key=True),
+    Column('quantity', Integer(), nullable=False),
+    Column('inv_cost', Numeric(12, 2), nullable=False)
+)
+
+# A single row holding the totals over the whole catalog
+inventory_totals = Table('inventory_totals', report_metadata,
+    Column('totals_id', Integer(), primary_key=True),
+    Column('total_quantity', Integer(), nullable=False),
+    Column('total_cost', Numeric(12, 2), nullable=False)
+)
+
+_new_quantity = 'coalesce(new.quantity, 0)'
+_old_quantity = 'coalesce(old.quantity, 0)'
+_new_cost = 'round(coalesce(new.quantity, 0) * coalesce(new.unit_cost, 0), 2)'
+_old_cost = 'round(coalesce(old.quantity, 0) * coalesce(old.unit_cost, 0), 2)'
+
+_valuation_triggers = [
+    """CREATE TRIGGER IF NOT EXISTS inventory_valuation_insert AFTER INSERT ON cookies BEGIN
+        INSERT INTO inventory_valuation (cookie_id, quantity, inv_cost)
+            VALUES (new.cookie_id, {new_quantity}, {new_cost});
+        UPDATE inventory_totals
+            SET total_quantity = total_quantity + {new_quantity},
+                total_cost = round(total_cost + {new_cost}, 2);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_valuation_update
+            AFTER UPDATE OF cookie_id, quantity, unit_cost ON cookies BEGIN
+        UPDATE inventory_valuation
+            SET cookie_id = new.cookie_id, quantity = {new_quantity}, inv_cost = {new_cost}
+            WHERE cookie_id = old.cookie_id;
+        UPDATE inventory_totals
+            SET total_quantity = total_quantity - {old_quantity} + {new_quantity},
+                total_cost = round(total_cost - {old_cost} + {new_cost}, 2);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_valuation_delete AFTER DELETE ON cookies BEGIN
+        DELETE FROM inventory_valuation WHERE cookie_id = old.cookie_id;
+        UPDATE inventory_totals
+            SET total_quantity = total_quantity - {old_quantity},
+                total_cost = round(total_cost - {old_cost}, 2);
+    END""",
+]
+_valuation_triggers = [trigger.format(new_quantity=_new_quantity, old_quantity=_old_quantity,
+                                      new_cost=_new_cost, old_cost=_old_cost)
+                       for trigger in _valuation_triggers]
+
+
+# Per-customer order count, shipped count and the extended_cost of every line
+# they have ordered, one row per user including users with no orders
+user_order_stats = Table('user_order_stats', report_metadata,
+    Column('user_id', Integer(), primary_key=True),
+    Column('order_count', Integer(), nullable=False),
+    Column('shipped_count', Integer(), nullable=False),
+    Column('lifetime_cost', Numeric(12, 2), nullable=False)
+)
+
+_order_stats_triggers = [
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_user_insert AFTER INSERT ON users BEGIN
+        INSERT INTO user_order_stats (user_id, order_count, shipped_count, lifetime_cost)
+            VALUES (new.user_id, 0, 0, 0);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_user_delete AFTER DELETE ON users BEGIN
+        DELETE FROM user_order_stats WHERE user_id = old.user_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_order_insert AFTER INSERT ON orders BEGIN
+        UPDATE user_order_stats
+            SET order_count = order_count + 1,
+                shipped_count = shipped_count + (coalesce(new.shipped, 0) = 1)
+            WHERE user_id = new.user_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_order_update
+            AFTER UPDATE OF user_id, shipped ON orders BEGIN
+        UPDATE user_order_stats
+            SET order_count = order_count - 1,
+                shipped_count = shipped_count - (coalesce(old.shipped, 0) = 1),
+                lifetime_cost = round(lifetime_cost - (SELECT coalesce(sum(extended_cost), 0)
+                    FROM line_items WHERE order_id = old.order_id), 2)
+            WHERE user_id = old.user_id;
+        UPDATE user_order_stats
+            SET order_count = order_count + 1,
+                shipped_count = shipped_count + (coalesce(new.shipped, 0) = 1),
+                lifetime_cost = round(lifetime_cost + (SELECT coalesce(sum(extended_cost), 0)
+                    FROM line_items WHERE order_id = new.order_id), 2)
+            WHERE user_id = new.user_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_order_delete AFTER DELETE ON orders BEGIN
+        UPDATE user_order_stats
+            SET order_count = order_count - 1,
+                shipped_count = shipped_count - (coalesce(old.shipped, 0) = 1),
+                lifetime_cost = round(lifetime_cost - (SELECT coalesce(sum(extended_cost), 0)
+                    FROM line_items WHERE order_id = old.order_id), 2)
+            WHERE user_id = old.user_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_line_insert AFTER INSERT ON line_items BEGIN
+        UPDATE user_order_stats
+            SET lifetime_cost = round(lifetime_cost + coalesce(new.extended_cost, 0), 2)
+            WHERE user_id = (SELECT user_id FROM orders WHERE order_id = new.order_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_line_update
+            AFTER UPDATE OF order_id, extended_cost ON line_items BEGIN
+        UPDATE user_order_stats
+            SET lifetime_cost = round(lifetime_cost - coalesce(old.extended_cost, 0), 2)
+            WHERE user_id = (SELECT user_id FROM orders WHERE order_id = old.order_id);
+        UPDATE user_order_stats
+            SET lifetime_cost = round(lifetime_cost + coalesce(new.extended_cost, 0), 2)
+            WHERE user_id = (SELECT user_id FROM orders WHERE order_id = new.order_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_order_stats_line_delete AFTER DELETE ON line_items BEGIN
+        UPDATE user_order_stats
+            SET lifetime_cost = round(lifetime_cost - coalesce(old.extended_cost, 0), 2)
+            WHERE user_id = (SELECT user_id FROM orders WHERE order_id = old.order_id);
+    END""",
+]
+
+# Computes the rollup from scratch, one row per user. Orders are aggregated per
+# user first so this stays a single pass over orders and line_items.
+_order_stats_query = text(
+    "SELECT users.user_id, coalesce(stats.order_count, 0) AS order_count, "
+    "coalesce(stats.shipped_count, 0) AS shipped_count, "
+    "coalesce(stats.lifetime_cost, 0) AS lifetime_cost "
+    "FROM users LEFT OUTER JOIN ("
+    "SELECT orders.user_id AS user_id, count(*) AS order_count, "
+    "sum(coalesce(orders.shipped, 0) = 1) AS shipped_count, "
+    "round(sum((SELECT coalesce(sum(line_items.extended_cost), 0) FROM line_items "
+    "WHERE line_items.order_id = orders.order_id)), 2) AS lifetime_cost "
+    "FROM orders GROUP BY orders.user_id) AS stats ON stats.user_id = users.user_id")
+
+
+# Recomputes the valuation tables from the cookies table
+def rebuild_inventory_valuation(connection):
+    with connection.begin():
+        connection.execute(inventory_valuation.delete())
+        connection.execute(inventory_totals.delete())
+        connection.execute(text(
+            "INSERT INTO inventory_valuation (cookie_id, quantity, inv_cost) "
+            "SELECT cookie_id, coalesce(quantity, 0), "
+            "round(coalesce(quantity, 0) * coalesce(unit_cost, 0), 2) FROM cookies"))
+        connection.execute(text(
+            "INSERT INTO inventory_totals (totals_id, total_quantity, total_cost) "
+            "SELECT 1, coalesce(sum(quantity), 0), round(coalesce(sum(inv_cost), 0), 2) "
+            "FROM inventory_valuation"))
+
+
+# Creates the valuation tables and triggers if they are missing and fills them
+# from the cookies already in the catalog. Safe to call more than once.
+def create_inventory_valuation(connection):
+    report_metadata.create_all(connection, tables=[inventory_valuation, inventory_totals])
+    with connection.begin():
+        for trigger in _valuation_triggers:
+            connection.execute(text(trigger))
+    rebuild_inventory_valuation(connection)
+
+
+# Recomputes user_order_stats from the users, orders and line_items tables
+def rebuild_user_order_stats(connection):
+    with connection.begin():
+        connection.execute(user_order_stats.delete())
+        connection.execute(text(
+            "INSERT INTO user_order_stats (user_id, order_count, shipped_count, lifetime_cost) "
+            + _order_stats_query.text))
+
+
+# Creates user_order_stats and its triggers if they are missing and fills it
+# from the existing orders. Safe to call more than once.
+def create_user_order_stats(connection):
+    report_metadata.create_all(connection, tables=[user_order_stats])
+    with connection.begin():
+        for trigger in _order_stats_triggers:
+            connection.execute(text(trigger))
+    rebuild_user_order_stats(connection)
+
+
+# Compares user_order_stats with a fresh aggregate of the orders and returns
+# the user_ids whose rows are wrong or missing. Pass rebuild=True to rebuild
+# the rollup when anything is off.
+def check_user_order_stats(connection, rebuild=False):
+    expected = {row.user_id: (row.order_count, row.shipped_count, round(row.lifetime_cost or 0, 2))
+                for row in connection.execute(_order_stats_query)}
+    s = select([user_order_stats])
+    actual = {row.user_id: (row.order_count, row.shipped_count, round(float(row.lifetime_cost), 2))
+              for row in connection.execute(s)}
+    mismatched = sorted(user_id for user_id in set(expected) | set(actual)
+                        if expected.get(user_id) != actual.get(user_id))
+    if mismatched and rebuild:
+        rebuild_user_order_stats(connection)
+    return mismatched
+
+
+# Returns (username, order_count) for every user, the same rows as the
+# outerjoin/group_by report but read from the rollup
+def orders_per_user(connection):
+    s = select([users.c.username, user_order_stats.c.order_count])
+    s = s.select_from(users.join(user_order_stats,
+                                 user_order_stats.c.user_id == users.c.user_id))
+    return connection.execute(s.order_by(users.c.username)).fetchall()
+
+
+# Returns the catalog totals as a row with total_quantity and total_cost
+def inventory_value(connection):
+    s = select([inventory_totals.c.total_quantity, inventory_totals.c.total_cost])
+    return connection.execute(s).first()
+
+
+# Returns cookie_name and inv_cost for every cookie, like the RaboinSQL2 report
+def inventory_cost_report(connection):
+    s = select([cookies.c.cookie_name, inventory_valuation.c.inv_cost])
+    s = s.select_from(cookies.join(
+        inventory_valuation, inventory_valuation.c.cookie_id == cookies.c.cookie_id))
+    return connection.execute(s).fetchall()
+
+
+# Times the on-demand totals against the maintained ones on a made up catalog,
+# after a round of random price and stock changes
+def benchmark_inventory_valuation(row_count=1000000, updates=10000, repeat=5):
+    engine = create_cookie_engine()
+    connection = engine.connect()
+    create_inventory_valuation(connection)
+    stats = load_cookies(connection, ({'cookie_name': 'cookie {}'.format(i),
+                                       'quantity': i % 500, 'unit_cost': (i % 300) / 100}
+                                      for i in range(row_count)))
+    print('Loaded {} cookies with triggers in {:.2f}s'.format(row_count, stats['seconds']))
+
+    rng = random.Random(100)
+    with connection.begin():
+        for _ in range(updates):
+            u = update(cookies).where(cookies.c.cookie_id == rng.randint(1, row_count))
+            if rng.random() < 0.5:
+                u = u.values(quantity=rng.randint(0, 500))
+            else:
+                u = u.values(unit_cost=rng.randint(1, 300) / 100)
+            connection.execute(u)
+
+    on_demand = select([func.sum(cookies.c.quantity),
+                        func.sum(cast(cookies.c.quantity * cookies.c.unit_cost, Numeric(12, 2)))])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        expected = connection.execute(on_demand).first()
+    scan_seconds = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        totals = inventory_value(connection)
+    read_seconds = (time.perf_counter() - start) / repeat
+
+    assert totals.total_quantity == expected[0]
+    assert abs(totals.total_cost - expected[1]) < 0.01
+    print('totals: scan {:.2f} ms  maintained {:.3f} ms'.format(
+        scan_seconds * 1000, read_seconds * 1000))
+
+
+# Times the outerjoin/group_by report against the rollup on made up orders,
+# shipping some of them with ship_orders first
+def benchmark_order_stats(user_count=10000, order_count=500000, repeat=5):
+    engine = create_cookie_engine()
+    connection = engine.connect()
+    create_user_order_stats(connection)
+
+    rng = random.Random(100)
+    start = time.perf_counter()
+    with connection.begin():
+        connection.execute(users.insert(), [
+            {'username': 'user{}'.format(i), 'email_address': 'user{}@cookie.com'.format(i),
+             'phone': '111-111-1111', 'password': 'password'}
+            for i in range(user_count)])
+        connection.execute(cookies.insert(), [{'cookie_name': 'chocolate chip',
+                                               'quantity': order_count, 'unit_cost': 0.50}])
+        connection.execute(orders.insert(), [
+            {'order_id': i, 'user_id': rng.randint(1, user_count)}
+            for i in range(1, order_count + 1)])
+        connection.execute(line_items.insert(), [
+            {'order_id': i, 'cookie_id': 1, 'quantity': 1, 'extended_cost': 0.50}
+            for i in range(1, order_count + 1)])
+    print('Loaded {} orders with triggers in {:.2f}s'.format(
+        order_count, time.perf_counter() - start))
+
+    ship_orders(connection, range(1, order_count + 1, 3))
+    assert check_user_order_stats(connection) == []
+
+    report = select([users.c.username, func.count(orders.c.order_id)])
+    report = report.select_from(users.outerjoin(orders)).group_by(users.c.username)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        expected = connection.execute(report.order_by(users.c.username)).fetchall()
+    join_seconds = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = orders_per_user(connection)
+    rollup_seconds = (time.perf_counter() - start) / repeat
+
+    assert [tuple(row) for row in rows] == [tuple(row) for row in expected]
+    print('orders per user: join {:.2f} ms  rollup {:.2f} ms'.format(
+        join_seconds * 1000, rollup_seconds * 1000))
+
+
+if __name__ == '__main__':
+    benchmark_inventory_valuation()
+    benchmark_order_stats()
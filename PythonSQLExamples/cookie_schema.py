@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Shared copy of the cookie store schema from RaboinSQL5 so the helper modules
+# in this folder can be imported without re-running a whole notebook. The only
+# difference is the index on line_items.order_id, since every shipping and
+# order lookup goes through it.
+
+from datetime import datetime
+
+from sqlalchemy import (MetaData, Table, Column, Integer, Numeric, String,
+                       DateTime, ForeignKey, Boolean, CheckConstraint)
+metadata = MetaData()
+
+cookies = Table('cookies', metadata,
+    Column('cookie_id', Integer(), primary_key=True),
+    Column('cookie_name', String(50), index=True),
+    Column('cookie_recipe_url', String(255)),
+    Column('cookie_sku', String(55)),
+    Column('quantity', Integer()),
+    Column('unit_cost', Numeric(12, 2)),
+    CheckConstraint('quantity >= 0', name='quantity_positive')
+)
+
+users = Table('users', metadata,
+    Column('user_id', Integer(), primary_key=True),
+    Column('username', String(15), nullable=False, unique=True),
+    Column('email_address', String(255), nullable=False),
+    Column('phone', String(20), nullable=False),
+    Column('password', String(25), nullable=False),
+    Column('created_on', DateTime(), default=datetime.now),
+    Column('updated_on', DateTime(), default=datetime.now, onupdate=datetime.now)
+)
+
+orders = Table('orders', metadata,
+    Column('order_id', Integer(), primary_key=True),
+    Column('user_id', ForeignKey('users.user_id')),
+    Column('shipped', Boolean(), default=False)
+)
+
+line_items = Table('line_items', metadata,
+    Column('line_items_id', Integer(), primary_key=True),
+    Column('order_id', ForeignKey('orders.order_id'), index=True),
+    Column('cookie_id', ForeignKey('cookies.cookie_id')),
+    Column('quantity', Integer()),
+    Column('extended_cost', Numeric(12,2))
+)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Name search for the cookies table. cookie_name LIKE '%chocolate%' and
+# .contains('chip') can't use the B-tree index on cookie_name, so this keeps an
+# SQLite FTS5 table with the trigram tokenizer in sync with cookies through
+# triggers and answers substring and prefix searches from it. Needs SQLite
+# 3.34 or newer for the trigram tokenizer.
+
+import random
+import time
+
+from sqlalchemy import select, text
+
+from cookie_engine import create_cookie_engine
+from cookie_schema import cookies
+from cookie_loader import load_cookies
+
+# The FTS table stores no copy of the names (content='cookies'), only the
+# trigram index, and uses cookie_id as its rowid
+_name_index_ddl = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS cookies_name_fts USING fts5(
+        cookie_name, content='cookies', content_rowid='cookie_id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS cookies_name_fts_insert AFTER INSERT ON cookies BEGIN
+        INSERT INTO cookies_name_fts(rowid, cookie_name) VALUES (new.cookie_id, new.cookie_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cookies_name_fts_delete AFTER DELETE ON cookies BEGIN
+        INSERT INTO cookies_name_fts(cookies_name_fts, rowid, cookie_name)
+            VALUES ('delete', old.cookie_id, old.cookie_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cookies_name_fts_update AFTER UPDATE OF cookie_id, cookie_name ON cookies BEGIN
+        INSERT INTO cookies_name_fts(cookies_name_fts, rowid, cookie_name)
+            VALUES ('delete', old.cookie_id, old.cookie_name);
+        INSERT INTO cookies_name_fts(rowid, cookie_name) VALUES (new.cookie_id, new.cookie_name);
+    END""",
+]
+
+# Trigram searches need at least three characters to use the index
+_min_indexed_length = 3
+
+_match_ids = text(
+    "SELECT rowid FROM cookies_name_fts WHERE cookies_name_fts MATCH :phrase ORDER BY rowid")
+# The scans and the prefix check fold case with fold_case rather than SQLite's
+# lower(), which only knows ASCII, so 'É' matches 'é' there as it does in the
+# trigram index. :term and :prefix are passed in already folded.
+_match_prefix_ids = text(
+    "SELECT rowid FROM cookies_name_fts WHERE cookies_name_fts MATCH :phrase "
+    "AND substr(fold_case(cookie_name), 1, length(:prefix)) = :prefix ORDER BY rowid")
+_scan_ids = text(
+    "SELECT cookie_id FROM cookies WHERE instr(fold_case(cookie_name), :term) > 0 "
+    "ORDER BY cookie_id")
+_scan_prefix_ids = text(
+    "SELECT cookie_id FROM cookies "
+    "WHERE substr(fold_case(cookie_name), 1, length(:prefix)) = :prefix ORDER BY cookie_id")
+
+
+# Creates the FTS table and its triggers if they are missing and indexes any
+# cookies already in the table. Safe to call more than once.
+def create_name_index(connection):
+    with connection.begin():
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cookies_name_fts'")).first()
+        for ddl in _name_index_ddl:
+            connection.execute(text(ddl))
+        if not exists:
+            connection.execute(text(
+                "INSERT INTO cookies_name_fts(cookies_name_fts) VALUES ('rebuild')"))
+
+
+# Unicode lower case, one character for one like the index's case folding
+# (str.casefold would turn 'ß' into 'ss')
+def _fold_case(value):
+    return None if value is None else value.lower()
+
+
+# Registers fold_case on the DBAPI connection behind connection; doing it again
+# just replaces the function
+def _register_fold_case(connection):
+    connection.connection.create_function('fold_case', 1, _fold_case, deterministic=True)
+
+
+# Quotes a search term as an FTS5 phrase so characters like - or * are matched
+# literally
+def _phrase(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+# Returns the ids of cookies whose name contains term, ignoring case
+def search_cookie_ids(connection, term):
+    if len(term) < _min_indexed_length:
+        _register_fold_case(connection)
+        rows = connection.execute(_scan_ids, term=_fold_case(term))
+    else:
+        rows = connection.execute(_match_ids, phrase=_phrase(term))
+    return [row[0] for row in rows]
+
+
+# Returns the ids of cookies whose name starts with prefix, ignoring case
+def prefix_cookie_ids(connection, prefix):
+    _register_fold_case(connection)
+    if len(prefix) < _min_indexed_length:
+        rows = connection.execute(_scan_prefix_ids, prefix=_fold_case(prefix))
+    else:
+        rows = connection.execute(_match_prefix_ids, phrase=_phrase(prefix),
+                                  prefix=_fold_case(prefix))
+    return [row[0] for row in rows]
+
+
+# Made up catalog of row_count cookies with names like 'dark chocolate chip 123'
+def _synthetic_catalog(row_count, seed=100):
+    flavors = ['chocolate chip', 'dark chocolate chip', 'peanut butter', 'oatmeal raisin',
+               'molasses', 'snickerdoodle', 'sugar', 'white chocolate macadamia',
+               'ginger snap', 'shortbread']
+    styles = ['', 'double ', 'mini ', 'vegan ', 'gluten free ']
+    rng = random.Random(seed)
+    for i in range(row_count):
+        yield {
+            'cookie_name': '{}{} {}'.format(rng.choice(styles), rng.choice(flavors), i),
+            'cookie_sku': 'SKU{:07d}'.format(i),
+            'quantity': 10,
+            'unit_cost': 0.50,
+        }
+
+
+# Times LIKE scans against the trigram index on a made up catalog
+def benchmark(row_count=1000000, repeat=5):
+    engine = create_cookie_engine()
+    connection = engine.connect()
+    load_cookies(connection, _synthetic_catalog(row_count))
+
+    start = time.perf_counter()
+    create_name_index(connection)
+    print('Indexed {} cookies in {:.2f}s'.format(row_count, time.perf_counter() - start))
+
+    searches = [
+        ('contains', 'chocolate', search_cookie_ids),
+        ('contains', 'macadamia 4242', search_cookie_ids),
+        ('prefix', 'vegan ginger', prefix_cookie_ids),
+        ('prefix', 'mini sugar 77', prefix_cookie_ids),
+    ]
+    for kind, term, search in searches:
+        if kind == 'contains':
+            like = cookies.c.cookie_name.contains(term)
+        else:
+            like = cookies.c.cookie_name.startswith(term)
+        like = select([cookies.c.cookie_id]).where(like).order_by(cookies.c.cookie_id)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            expected = [row[0] for row in connection.execute(like)]
+        like_seconds = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            found = search(connection, term)
+        index_seconds = (time.perf_counter() - start) / repeat
+
+        assert found == expected
+        print('{:>8} {!r:>18}: {:>7} rows  LIKE {:8.2f} ms  index {:8.2f} ms'.format(
+            kind, term, len(found), like_seconds * 1000, index_seconds * 1000))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Shipping helpers for the cookie store. ship_it is the per-line loop from
+# RaboinSQL5 and ship_orders ships a whole wave of orders with a fixed number
+# of statements, no matter how many orders or line items are in the wave.
+
+import time
+from collections import defaultdict
+
+from sqlalchemy import (MetaData, Table, Column, Integer, select, insert, update,
+                        delete, bindparam, func)
+from sqlalchemy.exc import IntegrityError
+
+from cookie_engine import create_cookie_engine
+from cookie_schema import cookies, users, orders, line_items
+
+# The orders in a wave and the cookie totals they need are staged in temporary
+# tables on the caller's connection, so the updates never need one bound
+# parameter per order.
+wave_metadata = MetaData()
+
+ship_wave = Table('ship_wave', wave_metadata,
+    Column('order_id', Integer(), primary_key=True),
+    prefixes=['TEMPORARY']
+)
+
+ship_totals = Table('ship_totals', wave_metadata,
+    Column('cookie_id', Integer(), primary_key=True),
+    Column('quantity', Integer()),
+    prefixes=['TEMPORARY']
+)
+
+
+# Ships one order with an update per line item, rolling back if any cookie
+# would go below zero
+def ship_it(connection, order_id):
+    s = select([line_items.c.cookie_id, line_items.c.quantity])
+    s = s.where(line_items.c.order_id == order_id)
+    transaction = connection.begin()
+    cookies_to_ship = connection.execute(s).fetchall()
+    try:
+        for cookie in cookies_to_ship:
+            u = update(cookies).where(cookies.c.cookie_id == cookie.cookie_id)
+            u = u.values(quantity = cookies.c.quantity - cookie.quantity)
+            connection.execute(u)
+        u = update(orders).where(orders.c.order_id == order_id)
+        u = u.values(shipped=True)
+        connection.execute(u)
+        transaction.commit()
+        return True
+    except IntegrityError:
+        transaction.rollback()
+        return False
+
+
+# Picks which orders can ship, in the order they were requested. An order is
+# skipped if it is unknown, already shipped, or any of its cookies would drop
+# below zero (the quantity_positive check) after the orders ahead of it.
+def _plan_wave(order_ids, rows):
+    known = {}
+    wanted = defaultdict(list)
+    for row in rows:
+        known[row.order_id] = row.shipped
+        if row.cookie_id is not None:
+            wanted[row.order_id].append(row)
+
+    stock = {}
+    accepted = []
+    for order_id in order_ids:
+        if order_id not in known or known[order_id]:
+            continue
+        lines = wanted[order_id]
+        remaining = [stock.get(line.cookie_id, line.stock) for line in lines]
+        if any(left is not None and left < (line.quantity or 0)
+               for left, line in zip(remaining, lines)):
+            continue
+        for left, line in zip(remaining, lines):
+            if left is not None:
+                stock[line.cookie_id] = left - (line.quantity or 0)
+        accepted.append(order_id)
+    return accepted
+
+
+# Ships a wave of orders in one transaction. All cookie quantities are
+# decremented by a single UPDATE and all orders are flagged by another.
+# Returns a dict of order_id -> True if it shipped, False if it did not.
+def ship_orders(connection, order_ids):
+    order_ids = list(dict.fromkeys(order_ids))
+    results = dict.fromkeys(order_ids, False)
+    if not order_ids:
+        return results
+
+    transaction = connection.begin()
+    try:
+        wave_metadata.create_all(connection)
+        connection.execute(delete(ship_wave))
+        connection.execute(delete(ship_totals))
+        connection.execute(insert(ship_wave),
+                           [{'order_id': order_id} for order_id in order_ids])
+
+        s = select([orders.c.order_id, orders.c.shipped, line_items.c.cookie_id,
+                    func.sum(line_items.c.quantity).label('quantity'),
+                    cookies.c.quantity.label('stock')])
+        s = s.select_from(ship_wave
+                          .join(orders, orders.c.order_id == ship_wave.c.order_id)
+                          .outerjoin(line_items)
+                          .outerjoin(cookies))
+        s = s.group_by(orders.c.order_id, line_items.c.cookie_id)
+        accepted = _plan_wave(order_ids, connection.execute(s))
+
+        rejected = set(order_ids).difference(accepted)
+        if rejected:
+            d = delete(ship_wave).where(ship_wave.c.order_id == bindparam('rejected_id'))
+            connection.execute(d, [{'rejected_id': order_id} for order_id in rejected])
+
+        totals = select([line_items.c.cookie_id,
+                         func.coalesce(func.sum(line_items.c.quantity), 0)])
+        totals = totals.select_from(line_items.join(
+            ship_wave, line_items.c.order_id == ship_wave.c.order_id))
+        totals = totals.where(line_items.c.cookie_id != None)
+        totals = totals.group_by(line_items.c.cookie_id)
+        connection.execute(insert(ship_totals).from_select(
+            ['cookie_id', 'quantity'], totals))
+
+        shipped_qty = select([ship_totals.c.quantity])
+        shipped_qty = shipped_qty.where(ship_totals.c.cookie_id == cookies.c.cookie_id)
+        u = update(cookies).where(cookies.c.cookie_id.in_(select([ship_totals.c.cookie_id])))
+        u = u.values(quantity = cookies.c.quantity - shipped_qty.as_scalar())
+        connection.execute(u)
+
+        u = update(orders).where(orders.c.order_id.in_(select([ship_wave.c.order_id])))
+        u = u.values(shipped=True)
+        connection.execute(u)
+        transaction.commit()
+    except IntegrityError:
+        transaction.rollback()
+        return results
+
+    for order_id in accepted:
+        results[order_id] = True
+    return results
+
+
+# Fills a fresh database with line_count line items spread over orders of
+# lines_per_order lines each, with enough stock for every order to ship
+def _load_orders(connection, line_count, lines_per_order=5, cookie_count=100):
+    connection.execute(insert(users).values(
+        username='cookiemon', email_address='mon@cookie.com',
+        phone='111-111-1111', password='password'))
+    connection.execute(insert(cookies), [
+        {'cookie_name': 'cookie {}'.format(i), 'cookie_sku': 'SKU{}'.format(i),
+         'quantity': line_count, 'unit_cost': 0.50}
+        for i in range(1, cookie_count + 1)
+    ])
+    order_count = line_count // lines_per_order
+    connection.execute(insert(orders), [
+        {'order_id': order_id, 'user_id': 1} for order_id in range(1, order_count + 1)
+    ])
+    connection.execute(insert(line_items), [
+        {'order_id': i // lines_per_order + 1, 'cookie_id': i % cookie_count + 1,
+         'quantity': 1, 'extended_cost': 0.50}
+        for i in range(order_count * lines_per_order)
+    ])
+    return list(range(1, order_count + 1))
+
+
+# Times the ship_it loop against ship_orders on the same data and checks both
+# leave the cookies table in the same state
+def benchmark(line_counts=(10000, 100000), lines_per_order=5):
+    for line_count in line_counts:
+        timings = []
+        stock = []
+        for ship in ('loop', 'wave'):
+            engine = create_cookie_engine()
+            connection = engine.connect()
+            order_ids = _load_orders(connection, line_count, lines_per_order)
+            start = time.perf_counter()
+            if ship == 'loop':
+                for order_id in order_ids:
+                    ship_it(connection, order_id)
+            else:
+                ship_orders(connection, order_ids)
+            timings.append(time.perf_counter() - start)
+            s = select([cookies.c.cookie_id, cookies.c.quantity])
+            stock.append(connection.execute(s.order_by(cookies.c.cookie_id)).fetchall())
+            connection.close()
+        assert stock[0] == stock[1]
+        print('{:>7} line items: ship_it loop {:8.3f}s  ship_orders {:8.3f}s  ({:.1f}x)'.format(
+            line_count, timings[0], timings[1], timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    benchmark()